@@ -1,38 +1,186 @@
-import os.path
 import json
 import collections
+import os
+import time
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from survey import Survey, SurveyPatch
+from survey_patch import apply_patch, numbered_survey, PatchError
+from sheets import CredentialManager, ServicePool, batch_get, execute
+from chat_log import ChatHistoryLog
+from partial_json import PartialJSONParser
+from analysis_prompt import build_analysis_messages, prompt_token_report
+from survey_store import SurveyStore
+from context_window import ContextWindow
+from resilience import default_guard
+from metrics import REGISTRY, STAGE_SECONDS, span
 
-from openai import OpenAI
-from survey import Survey
-
-client = OpenAI()
+# openai, numpy and the Google client libraries are imported on first use (see default_client and
+# the aggregation methods), so generating or editing a survey never pays for the Sheets/analysis stack.
+client = None
 
 
+MODEL = "gpt-4o-mini"
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
 MY_SPREADSHEET_ID = "1Vb6tEHacv_DCs8OgtWt-x0k_M57zXrFt1A16ptHKLPE"
 MY_RANGE_NAME = "Formularantworten 1!A:F"
+HISTORY_LIMIT = 100  # Messages kept in memory; the full history lives in the chat log.
+
+
+def default_client():
+    """Returns the shared OpenAI client, creating it on first use."""
+    global client
+    if client is None:
+        from openai import OpenAI
+        # Retries are done by the resilience layer, which also honours the rate limits shared across clients.
+        client = OpenAI(max_retries=0)
+    return client
+
 
 class SurveyAgent:
     
-    def __init__(self):
+    def __init__(self, openai_client=None, cache=None, chat_log=None, context=None, survey_file="survey.json",
+                 workers=None, normalize=False, llm_guard=None, sheets_guard=None, survey_codec="json"):
         self.surveys = []
-        self.chat_history = []
+        self.chat_history = collections.deque(maxlen=HISTORY_LIMIT)
+        self.openai_client = openai_client
+        self.cache = cache
+        self.chat_log = chat_log or ChatHistoryLog("chat_history.jsonl")
+        self.context = context or ContextWindow()
+        self.prompt_report = None
+        self.pool = None
+        self.survey_file = survey_file
+        self.survey_codec = survey_codec
+        self.stores = {}
+        self.workers = workers
+        self.normalize = normalize
+        self.normalizer = None
+        self.normalizer_key = None
+        self.llm_guard = llm_guard or default_guard("OpenAI", MODEL)
+        self.sheets_guard = sheets_guard or default_guard("Google Sheets", "sheets")
+
+    @property
+    def client(self):
+        """The OpenAI client: the one passed in, or the shared default client (created on first use)."""
+        if self.openai_client is None:
+            self.openai_client = default_client()
+        return self.openai_client
 
     def add_to_chat_history(self, role:str , content: str):
-        """Adds a message to the chat history."""
-        self.chat_history.append({"role": role, "content": content})
-        self.save_chat_history("chat_history.json")
+        """Adds a message to the chat history, the chat log and the editing context window."""
+        message = {"role": role, "content": content}
+        self.chat_history.append(message)
+        self.chat_log.append(message)
+        if isinstance(content, dict):
+            # The current survey is sent with every edit request, so older versions only leave a note.
+            content = f"(survey updated: {content.get('title', '')})"
+        self.context.add(role, content)
 
-    def generate_survey(self, topic: str) -> Survey:
+    def complete(self, messages: list, response_format=None) -> str:
         """
-        Uses GPT-4o-mini to generate a survey for a given topic.
+        Sends a chat completion request and returns the message content.
+        Byte-identical requests are answered from the cache, if one is configured.
+        Raises resilience.ServiceError if the request still fails after the retries.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(MODEL, messages, response_format)
+            cached = self.cache.get(key)
+            REGISTRY.record_cache(cached is not None)
+            if cached is not None:
+                return cached
+
+        with span("llm_call"):
+            response = self.request_completion(messages, response_format)
+        REGISTRY.record_usage(MODEL, getattr(response, "usage", None))
+        content = response.choices[0].message.content
+
+        if key is not None:
+            self.cache.set(key, content)
+        return content
+
+    def request_completion(self, messages: list, response_format=None):
+        if response_format is None:
+            return self.llm_guard.call(
+                self.client.chat.completions.create,
+                model=MODEL,
+                store=True,
+                messages=messages,
+            )
+        return self.llm_guard.call(
+            self.client.beta.chat.completions.parse,
+            model=MODEL,
+            store=True,
+            messages=messages,
+            response_format=response_format,
+        )
+
+    def stream_completion(self, messages: list, response_format=None):
+        """
+        Streams the message content of a chat completion as text chunks.
+        A cached response arrives as a single chunk; a streamed response is cached once it is complete.
+        Opening the stream is retried like complete(); an error after the first chunk is raised as is.
         """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(MODEL, messages, response_format)
+            cached = self.cache.get(key)
+            REGISTRY.record_cache(cached is not None)
+            if cached is not None:
+                yield cached
+                return
+
+        parts = []
+        usage = None
+        started = time.perf_counter()
+        if response_format is None:
+            stream = self.llm_guard.call(
+                self.client.chat.completions.create,
+                model=MODEL,
+                store=True,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if not parts:
+                        REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - started, stage="llm_first_token")
+                    parts.append(delta)
+                    yield delta
+        else:
+            def open_stream():
+                manager = self.client.beta.chat.completions.stream(
+                    model=MODEL,
+                    store=True,
+                    messages=messages,
+                    response_format=response_format,
+                    stream_options={"include_usage": True},
+                )
+                return manager, manager.__enter__()
+
+            manager, stream = self.llm_guard.call(open_stream)
+            try:
+                for event in stream:
+                    if event.type == "chunk":
+                        usage = getattr(event.chunk, "usage", None) or usage
+                    elif event.type == "content.delta":
+                        if not parts:
+                            REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - started, stage="llm_first_token")
+                        parts.append(event.delta)
+                        yield event.delta
+            finally:
+                manager.__exit__(None, None, None)
+        # Includes the time the consumer spent between chunks, i.e. what the user waited for.
+        REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - started, stage="llm_stream")
+        REGISTRY.record_usage(MODEL, usage)
+
+        if key is not None:
+            self.cache.set(key, "".join(parts))
+
+    def build_survey_messages(self, topic: str) -> list:
+        """Builds the chat messages asking the LLM for a survey on the given topic."""
         prompt = f"""
         Create a survey on the topic "{topic}".
         The survey should have the following structure:
@@ -58,25 +206,44 @@ class SurveyAgent:
             {"role": "system", "content": prompt},
             {"role": "user", "content": topic}
         ]
-        try:
-            response = client.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                store=True,
-                messages=messages,
-                response_format=Survey,
-            )
-            survey = response.choices[0].message.content
-            self.add_to_chat_history("assistant",json.loads(survey))
-            
-            return survey
-        except Exception as e:
-            print(f"An error occurred during survey generation: {e}")
-            return None
+        return messages
 
-    def update_survey(self, survey: Survey, modifications: str) -> Survey:
+    def generate_survey(self, topic: str) -> Survey:
+        """
+        Uses GPT-4o-mini to generate a survey for a given topic.
+        """
+        messages = self.build_survey_messages(topic)
+        survey = self.complete(messages, response_format=Survey)
+        self.add_to_chat_history("assistant",json.loads(survey))
+        return survey
+
+    def stream_survey(self, topic: str):
+        """
+        Like generate_survey, but yields the survey (as dict) while it is being generated.
+        Every snapshot contains the fields and list elements received completely so far;
+        the last one is the validated, complete survey.
+        """
+        parser = PartialJSONParser()
+        parts = []
+        for chunk in self.stream_completion(self.build_survey_messages(topic), response_format=Survey):
+            parts.append(chunk)
+            snapshot = parser.feed(chunk)
+            if snapshot is not None:
+                yield snapshot
+        survey = Survey.model_validate_json("".join(parts)).model_dump()
+        self.add_to_chat_history("assistant", survey)
+        yield survey
+
+    def update_survey(self, survey: Survey, modifications: str, patch: bool = False) -> Survey:
         """
         Uses GPT-4o-mini to modify the given survey according to the provided instructions.
+        With patch=True the model only returns the edit operations, see patch_survey.
+        The instructions and the result are added to the chat history once the update succeeded;
+        the context window sent along only holds the earlier turns.
         """
+        if patch:
+            return self.patch_survey(survey, modifications)
+
         edit_prompt = f"""
         Here is an existing survey:
         {survey}
@@ -86,171 +253,292 @@ class SurveyAgent:
 
         Output the updated survey in strictly valid JSON format adhering the same structure.
         """
-        messages = [
-            {"role": "system", "content": "You are a survey editing assistant using GPT-4o-mini."},
-            {"role": "user", "content": edit_prompt}
-        ]
+        messages = self.context.build_messages(
+            "You are a survey editing assistant using GPT-4o-mini.",
+            edit_prompt
+        )
+        updated_survey = self.complete(messages, response_format=Survey)
+        self.add_to_chat_history("user", modifications)
+        self.add_to_chat_history("assistant", json.loads(updated_survey))
+        return updated_survey
+
+    def patch_survey(self, survey: str, modifications: str) -> str:
+        """
+        Uses GPT-4o-mini to turn the instructions into a small list of edit operations (SurveyPatch)
+        and applies them locally. Falls back to a full update if the patch does not fit the survey.
+        """
+        current = Survey.model_validate_json(survey)
+        edit_prompt = f"""
+        Here is an existing survey, with 0-based question and option indexes:
+        {numbered_survey(current)}
+
+        Express the following modifications as a list of edit operations:
+        {modifications}
+
+        Available operations: set_title, set_introduction (text), add_question (text, options, optional question
+        index to insert at), replace_question (question, text and/or options), remove_question (question),
+        add_option (question, text, optional option index to insert at), replace_option (question, option, text),
+        remove_option (question, option). Indexes refer to the survey after the previous operations.
+        Set unused fields to null and use as few operations as possible.
+        """
+        messages = self.context.build_messages(
+            "You are a survey editing assistant using GPT-4o-mini.",
+            edit_prompt
+        )
         try:
-            response = client.beta.chat.completions.parse(
-                model="gpt-4o-mini",
-                store=True,
-                messages=messages,
-                response_format=Survey,
-            )
-            updated_survey = response.choices[0].message.content
+            patch = SurveyPatch.model_validate_json(self.complete(messages, response_format=SurveyPatch))
+            updated_survey = apply_patch(current, patch).model_dump_json()
+            self.add_to_chat_history("user", modifications)
             self.add_to_chat_history("assistant", json.loads(updated_survey))
-            
+
             return updated_survey
-        except Exception as e:
-            print(f"An error occurred during survey modification: {e}")
-            return survey
-        
+        except PatchError as e:
+            print(f"The survey patch could not be applied ({e}), falling back to a full update.")
+            return self.update_survey(survey, modifications)
+
+    def survey_store(self, filename: str = None) -> SurveyStore:
+        """Returns the (cached) SurveyStore of a survey file, by default the agent's survey definition."""
+        path = os.path.abspath(filename or self.survey_file)
+        store = self.stores.get(path)
+        if store is None:
+            store = self.stores[path] = SurveyStore(path, self.survey_codec)
+        return store
+
     def save_survey(self, survey: str, filename: str):
-        """Parses the survey JSON string and saves it in a compact format (without newline characters)."""
+        """Validates the survey JSON string and saves it as a new version in the compact format of the store."""
         try:
-            survey_dict = json.loads(survey)
-        except Exception as e:
+            self.survey_store(filename).save(survey)
+        except ValueError as e:
             print("Error parsing survey JSON:", e)
-            return
-
-        with open(filename, "w") as f:
-            json.dump(survey_dict, f, separators=(',', ':'))
     
     
     def save_chat_history(self, filename: str):
-        """Saves the chat history in JSON format."""
+        """Saves the full chat history from the chat log in the compact JSON format."""
         try:
-            with open(filename, "w") as f:
-                json.dump(self.chat_history, f, separators=(',', ':'))
+            self.chat_log.flush()
+            self.chat_log.compact(filename)
         except Exception as e:
             print("Error saving chat history JSON:", e)
     
     
+    def sheets_pool(self, scopes) -> ServicePool:
+        """
+        Returns the agent's Sheets service pool. On first use the credentials are loaded
+        and their background refresh is started.
+        """
+        if self.pool is None:
+            self.pool = ServicePool(CredentialManager(scopes).start())
+        return self.pool
+
+    def get_credentials(self, scopes):
+        """Returns the OAuth credentials, authorizing on first use if necessary."""
+        return self.sheets_pool(scopes).credentials.get()
+
+    def fetch_rows(self, scopes, spreadsheet_id, range_def) -> list:
+        """Fetches the raw rows of a range from the Google Sheet."""
+        with self.sheets_pool(scopes).service() as service, span("sheets_fetch"):
+            sheet = service.spreadsheets()
+            result = execute(sheet.values().get(
+                spreadsheetId=spreadsheet_id,
+                range=range_def
+            ), self.sheets_guard)
+        return result.get("values", [])
+
+    def load_survey(self) -> dict:
+        """
+        Returns the survey definition the responses belong to. It is parsed and validated
+        only when the file changed; the returned dict is shared and must not be modified.
+        """
+        return self.survey_store().load_dict()
+
+    def load_survey_info(self):
+        """Returns title and introduction of the survey definition."""
+        survey_data = self.load_survey()
+        return survey_data.get("title", ""), survey_data.get("introduction", "")
+
+    def sheets_source(self, spreadsheet_id, range_def, scopes=SCOPES) -> "SheetsSource":
+        """Returns a ResponseSource reading the given Google Sheets range."""
+        from sources import SheetsSource
+        return SheetsSource(self.sheets_pool(scopes), spreadsheet_id, range_def, self.sheets_guard)
+
     def fetch_and_aggregate_responses(self, scopes, spreadsheet_id, range_def) -> dict:
         """
         Fetch responses from the Google Sheet, aggregate them, and return the data in the desired format.
         """
-        with open("survey.json", "r") as f:
-            survey_data = json.load(f)
-        survey_title = survey_data.get("title", "")
-        survey_description = survey_data.get("introduction", "")
-
-        creds = None
-        if os.path.exists("token.json"):
-            creds = Credentials.from_authorized_user_file("token.json", scopes)
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file("credentials.json", scopes)
-                creds = flow.run_local_server(port=0)
-            with open("token.json", "w") as token:
-                token.write(creds.to_json())
-        try:
-            service = build("sheets", "v4", credentials=creds)
+        survey_title, survey_description = self.load_survey_info()
+
+        rows = self.fetch_rows(scopes, spreadsheet_id, range_def)
+        if not rows:
+            print("No data found.")
+            return {}
+        aggregated_data = self.aggregate_responses(rows, survey_title, survey_description)
+        return aggregated_data
+
+    def fetch_and_aggregate_many(self, scopes, requests: list) -> list:
+        """
+        Fetches many (spreadsheet_id, range) pairs with one batchGet call per spreadsheet
+        and aggregates each range separately. Results are returned in the order of requests.
+        """
+        survey_title, survey_description = self.load_survey_info()
+
+        with self.sheets_pool(scopes).service() as service, span("sheets_fetch"):
+            fetched = batch_get(service, requests, self.sheets_guard)
+        return [
+            self.aggregate_responses(rows, survey_title, survey_description) if rows else {}
+            for rows in fetched
+        ]
+
+    def update_aggregator(self, aggregator: "IncrementalAggregator", scopes, spreadsheet_id, range_def) -> int:
+        """
+        Fetches the header, the last processed row and all rows after it in one batchGet call
+        and folds the new rows into the aggregator. The counters are rebuilt from scratch if the sheet,
+        its header row or the last processed row changed. Returns the number of rows folded in,
+        or None if the sheet is empty.
+        """
+        from incremental import make_range
+
+        last_row = aggregator.last_row
+        with self.sheets_pool(scopes).service() as service, span("sheets_fetch"):
             sheet = service.spreadsheets()
-            result = sheet.values().get(
+            result = execute(sheet.values().batchGet(
                 spreadsheetId=spreadsheet_id,
-                range=range_def
-            ).execute()
-            rows = result.get("values", [])
-            if not rows:
-                print("No data found.")
-                return {}
-            aggregated_data = self.aggregate_responses(rows, survey_title, survey_description)
-            return aggregated_data
-        except HttpError as err:
-            print(err)
+                ranges=[
+                    make_range(range_def, 1, 1),
+                    make_range(range_def, last_row, last_row),
+                    make_range(range_def, last_row + 1)
+                ]
+            ), self.sheets_guard)
+            header_range, last_range, new_range = result.get("valueRanges", [{}, {}, {}])
+            header = (header_range.get("values") or [[]])[0]
+            if not header:
+                return None
+            last = (last_range.get("values") or [[]])[0]
+            rows = new_range.get("values", [])
+
+            if aggregator.needs_rebuild(spreadsheet_id, range_def, header, last):
+                stale = aggregator.last_row > 1
+                aggregator.reset(spreadsheet_id, range_def, header)
+                if stale:
+                    rows = execute(sheet.values().get(
+                        spreadsheetId=spreadsheet_id,
+                        range=make_range(range_def, 2)
+                    ), self.sheets_guard).get("values", [])
+
+        with span("aggregation"):
+            aggregator.update(rows)
+        return len(rows)
+
+    def fetch_and_aggregate_new_responses(self, scopes, spreadsheet_id, range_def,
+                                          state_file="aggregation_state.json", rebuild=False) -> dict:
+        """
+        Fetches only the rows appended since the last call and folds them into the persisted counters.
+        The counters are rebuilt from scratch if requested, or if the sheet or its header row changed.
+        """
+        from incremental import IncrementalAggregator
+
+        survey_title, survey_description = self.load_survey_info()
+
+        aggregator = IncrementalAggregator(state_file)
+        if rebuild:
+            aggregator.clear()
+
+        if self.update_aggregator(aggregator, scopes, spreadsheet_id, range_def) is None:
+            print("No data found.")
             return {}
+        aggregator.save()
+        return self.normalize_results(aggregator.result(survey_title, survey_description))
 
     def aggregate_responses(self, rows, title, description) -> dict:
         """
-        Aggregates the responses from the sheet rows.
+        Aggregates the responses from the sheet rows, or from any ResponseSource.
+        Large row lists are counted in parallel shards across self.workers processes.
+        The answers are normalized against the survey options if self.normalize is set.
         Assumption: The first row contains headers, where the first column (e.g. timestamp) is not evaluated.
         """
-        if not rows or len(rows) < 2:
-            return {"title": title, "description": description, "questions": []}
-        
-        header = rows[0]  # e.g. ["Column 1", "Question 1", "Question 2"]
-        responses = rows[1:]  # Each row corresponds to a response
-        questions = header[1:]  # Questions start from the second column
-        analysis_list = []
-        
-        for i, question in enumerate(questions, start=1):
-            counter = collections.Counter()
-            for response in responses:
-                if len(response) > i:
-                    answer = response[i]
-                    counter[answer] += 1
-            
-            total = sum(counter.values())
-            distribution = []
-            for option, count in counter.items():
-                percentage = round((count / total) * 100, 2) if total > 0 else 0.0
-                distribution.append({
-                    "option": option,
-                    "count": count,
-                    "percentage": percentage
-                })
-            most_common_answer = counter.most_common(1)[0][0] if total > 0 else None
-            
-            analysis_list.append({
-                "question": question,
-                "analysis": {
-                    "most_common_answer": most_common_answer,
-                    "distribution": distribution
-                }
-            })
-        
-        return {
-            "title": title,
-            "description": description,
-            "questions": analysis_list
-        }
-    
-    def generate_survey_analysis(self) -> str:
+        from aggregation import aggregate_encoded
+        from parallel import aggregate_parallel
+        from sources import ResponseSource
+
+        with span("aggregation"), REGISTRY.profile("aggregation"):
+            if isinstance(rows, ResponseSource):
+                source = rows
+                results = aggregate_encoded(source.header()[1:], source.columns(), title, description)
+            else:
+                results = aggregate_parallel(rows, title, description, workers=self.workers)
+        return self.normalize_results(results)
+
+    def normalize_results(self, results: dict) -> dict:
         """
-        Generates an analysis of the survey responses using LLM.
+        If normalization is enabled, maps the raw answers onto the answer options of the survey definition
+        (case/whitespace-insensitive, multi-select aware, fuzzy) with unmatched answers in an "Other" bucket.
+        The option index is kept while the survey definition is unchanged, so its memoized matches carry over.
         """
-        
-        results = self.fetch_and_aggregate_responses(SCOPES, MY_SPREADSHEET_ID, MY_RANGE_NAME)
-        with open("survey.json", "r") as f:
-            survey = json.load(f)
+        if not self.normalize or not results:
+            return results
+        from normalize import SurveyNormalizer
 
-        prompt = f"""
-            You are an expert data analyst. Below you are provided with two sections:
+        with span("normalization"):
+            store = self.survey_store()
+            survey = store.load_dict()
+            key = store.current_version()
+            if self.normalizer_key != key:
+                self.normalizer = SurveyNormalizer(survey)
+                self.normalizer_key = key
+            return self.normalizer.normalize(results)
 
-            1. Survey:
-            {str(survey)}
+    def aggregate_source(self, source: "ResponseSource") -> dict:
+        """Aggregates the responses of a source under the title and introduction of the survey definition."""
+        survey_title, survey_description = self.load_survey_info()
+        return self.aggregate_responses(source, survey_title, survey_description)
+    
+    def find_associations(self, source: "ResponseSource", top: int = 3) -> list:
+        """Selects the most strongly associated question pairs of a source (see crosstab.strongest_associations)."""
+        from crosstab import strongest_associations
 
-            2. Aggregated Survey Responses:
-            {str(results)}
+        with span("crosstab"):
+            return strongest_associations(source.header()[1:], source.columns(), top=top)
+
+    def build_analysis_messages(self, survey: dict, results: dict, associations: list = None) -> list:
+        """
+        Builds the chat messages asking the LLM for an analysis of the aggregated responses.
+        Survey and results are serialized once as a compact table with locally computed statistics,
+        followed by the strongest associations between questions, if given.
+        """
+        with span("prompt_build"):
+            messages = build_analysis_messages(survey, results, associations)
+        self.prompt_report = prompt_token_report(survey, results, messages)
+        return messages
 
-            Your task is to create an executive summary. First, provide a concise overview of the aggregated data, highlighting key statistics such as response counts, most common answers, and the distribution of responses per question. Then, analyze the data to identify significant trends, patterns, and anomalies. Discuss what these findings might imply for the underlying survey topic and provide any insights you deem relevant. Use the Questions and Answer Options from {Survey} as references to the aggregated responses when unclear. Make the analysis sound not too technical but informative. Make it short. Make it fun to read.
+    def prepare_analysis(self, incremental: bool = False) -> list:
+        """
+        Fetches and aggregates the responses and builds the analysis messages.
+        With incremental=True only the responses added since the previous run are fetched;
+        question associations need the individual rows and are only included in a full fetch.
+        """
+        associations = None
+        if incremental:
+            results = self.fetch_and_aggregate_new_responses(SCOPES, MY_SPREADSHEET_ID, MY_RANGE_NAME)
+        else:
+            source = self.sheets_source(MY_SPREADSHEET_ID, MY_RANGE_NAME)
+            results = self.aggregate_source(source) if source.rows() else {}
+            associations = self.find_associations(source)
+        survey = self.load_survey()
 
-            Please structure your response in two sections:
-            - "Overview": A brief summary of the key numbers and distributions.
-            - "Analysis": A detailed discussion of trends and patterns
+        return self.build_analysis_messages(survey, results, associations)
 
-            Output your response in a structured format and in the language of in which the survey is written."""
+    def generate_survey_analysis(self, incremental: bool = False) -> str:
+        """
+        Generates an analysis of the survey responses using LLM.
+        With incremental=True only the responses added since the previous run are fetched.
+        """
+        messages = self.prepare_analysis(incremental)
+        return self.complete(messages)
         
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": str(results)}
-        ]
+    def stream_survey_analysis(self, incremental: bool = False):
+        """Like generate_survey_analysis, but yields the analysis text in chunks as the LLM produces it."""
+        messages = self.prepare_analysis(incremental)
+        yield from self.stream_completion(messages)
 
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                store=True,
-                messages=messages,
-            )
-            return response.choices[0].message.content
-        
-        except Exception as e:
-            print(f"An error occurred during survey analysis generation: {e}")
-            return None
-        
     def save_analysis(self, analysis: str, filename: str):
         """Saves the survey analysis in JSON format."""
         try:
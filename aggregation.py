@@ -0,0 +1,104 @@
+import itertools
+
+import numpy as np
+
+
+def encode_column(values):
+    """
+    Encodes a column of raw answers as integer category codes.
+    Categories are numbered in order of first appearance, missing cells (None) get the code -1.
+    """
+    lookup = dict.fromkeys(values)
+    lookup.pop(None, None)
+    categories = list(lookup)
+    lookup = dict(zip(categories, range(len(categories))))
+    lookup[None] = -1
+    codes = np.fromiter(map(lookup.__getitem__, values), dtype=np.intp, count=len(values))
+    return codes, categories
+
+
+def encode_columns(responses, n_columns, offset=1) -> list:
+    """
+    Transposes the response rows in one pass and encodes every question column.
+    Short rows (Sheets omits trailing empty cells) are padded with missing cells.
+    """
+    columns = list(itertools.zip_longest(*responses, fillvalue=None))[offset:offset + n_columns]
+    missing = (None,) * len(responses)
+    columns += [missing] * (n_columns - len(columns))
+    return [encode_column(column) for column in columns]
+
+
+def count_codes(codes, n_categories):
+    """Counts the occurrences of each category code, ignoring missing cells."""
+    return np.bincount(codes[codes >= 0], minlength=n_categories)
+
+
+def count_responses(responses, n_columns) -> list:
+    """Counts the answers of every question column, as one {answer: count} dict per question in first-seen order."""
+    counters = []
+    for codes, categories in encode_columns(responses, n_columns):
+        counts = count_codes(codes, len(categories)).tolist()
+        counters.append({option: count for option, count in zip(categories, counts) if count})
+    return counters
+
+
+def merge_counters(counters, parts):
+    """
+    Adds partial per-question counters into counters, in place. Merging is associative, and merging
+    shards in row order keeps the first-seen order of answers, so results match a serial count.
+    """
+    for counter, part in zip(counters, parts):
+        for option, count in part.items():
+            counter[option] = counter.get(option, 0) + count
+    return counters
+
+
+def summarize_counts(question, categories, counts) -> dict:
+    """Builds the per-question analysis entry from categories and their counts."""
+    counts = [int(count) for count in counts]
+    total = sum(counts)
+    distribution = []
+    for option, count in zip(categories, counts):
+        if count == 0:
+            continue
+        percentage = round((count / total) * 100, 2) if total > 0 else 0.0
+        distribution.append({
+            "option": option,
+            "count": count,
+            "percentage": percentage
+        })
+    most_common_answer = categories[counts.index(max(counts))] if total > 0 else None
+
+    return {
+        "question": question,
+        "analysis": {
+            "most_common_answer": most_common_answer,
+            "distribution": distribution
+        }
+    }
+
+
+def aggregate_encoded(questions, encoded, title, description) -> dict:
+    """Aggregates already encoded question columns ((codes, categories) per question)."""
+    analysis_list = []
+    for question, (codes, categories) in zip(questions, encoded):
+        counts = count_codes(codes, len(categories))
+        analysis_list.append(summarize_counts(question, categories, counts))
+
+    return {
+        "title": title,
+        "description": description,
+        "questions": analysis_list
+    }
+
+
+def aggregate_columnar(rows, title, description) -> dict:
+    """
+    Aggregates the responses from the sheet rows column by column.
+    Assumption: The first row contains headers, where the first column (e.g. timestamp) is not evaluated.
+    """
+    if not rows or len(rows) < 2:
+        return {"title": title, "description": description, "questions": []}
+
+    questions = rows[0][1:]
+    return aggregate_encoded(questions, encode_columns(rows[1:], len(questions)), title, description)
@@ -0,0 +1,126 @@
+import math
+
+from context_window import approximate_token_count
+
+ANALYSIS_INSTRUCTIONS = """You are an expert data analyst. You are given a survey and its aggregated responses as a compact table.
+Every question is listed with its number of responses (n), the most common answer and flags computed beforehand:
+"dominant" means one answer got at least 60% of the responses, "even" means the answers are spread almost uniformly.
+Below each question, every answer option is listed as: option | count | percent. Options nobody chose have count 0.
+If an "Associations" section follows, it lists the question pairs whose answers are most strongly related
+(Cramér's V from 0 = unrelated to 1 = fully dependent) together with their most common answer combinations.
+
+Your task is to create an executive summary. First, provide a concise overview of the aggregated data, highlighting key statistics such as response counts, most common answers, and the distribution of responses per question. Then, analyze the data to identify significant trends, patterns, and anomalies. Discuss what these findings might imply for the underlying survey topic and provide any insights you deem relevant. Make the analysis sound not too technical but informative. Make it short. Make it fun to read.
+
+Please structure your response in two sections:
+- "Overview": A brief summary of the key numbers and distributions.
+- "Analysis": A detailed discussion of trends and patterns
+
+Output your response in a structured format and in the language of in which the survey is written."""
+
+DOMINANT_SHARE = 0.6
+EVEN_ENTROPY = 0.95
+
+
+def question_stats(options: list, counts: list, top_k: int = 3) -> dict:
+    """
+    Computes the derived statistics of one question from its options and counts:
+    total responses, top-k answers, normalized entropy and skew flags.
+    """
+    total = sum(counts)
+    ranked = sorted(zip(options, counts), key=lambda pair: -pair[1])
+    entropy = 0.0
+    if total > 0 and len(options) > 1:
+        entropy = -sum((c / total) * math.log(c / total) for c in counts if c > 0) / math.log(len(options))
+    flags = []
+    if total > 0 and ranked[0][1] / total >= DOMINANT_SHARE:
+        flags.append("dominant")
+    if total > 0 and entropy >= EVEN_ENTROPY:
+        flags.append("even")
+    return {
+        "total": total,
+        "top": [option for option, count in ranked[:top_k] if count > 0],
+        "entropy": round(entropy, 2),
+        "flags": flags
+    }
+
+
+def merge_options(item: dict, entry: dict):
+    """Combines the survey's answer options with the counted answers, keeping survey order first."""
+    counts = {d["option"]: d["count"] for d in entry.get("analysis", {}).get("distribution", [])}
+    options = [option["option"] for option in (item or {}).get("options", [])]
+    options += [option for option in counts if option not in options]
+    return options, [counts.get(option, 0) for option in options]
+
+
+def format_results(survey: dict, results: dict, max_options: int = 10) -> str:
+    """
+    Serializes survey and aggregate once, as a compact question -> option -> count/percent table.
+    Options beyond max_options (by count) are folded into a single "other" row.
+    """
+    items = {item["question"].strip(): item for item in survey.get("questions", [])}
+    lines = [f"Survey: {survey.get('title', '')}", f"Introduction: {survey.get('introduction', '')}"]
+
+    entries = results.get("questions", []) if results else []
+    if not entries:
+        lines.append("No responses yet.")
+    for number, entry in enumerate(entries, start=1):
+        options, counts = merge_options(items.get(entry["question"].strip()), entry)
+        stats = question_stats(options, counts)
+        total = stats["total"]
+        header = f"Q{number}: {entry['question']} (n={total}"
+        if stats["top"]:
+            header += f", top={stats['top'][0]}"
+        header += f", entropy={stats['entropy']}"
+        header += "".join(f", {flag}" for flag in stats["flags"]) + ")"
+        lines.append("")
+        lines.append(header)
+
+        ranked = sorted(zip(options, counts), key=lambda pair: -pair[1])
+        shown, rest = ranked[:max_options], ranked[max_options:]
+        if rest:
+            shown.append((f"other ({len(rest)} options)", sum(count for _, count in rest)))
+        for option, count in shown:
+            percent = round(count / total * 100, 1) if total else 0.0
+            lines.append(f"{option} | {count} | {percent:g}")
+
+    return "\n".join(lines)
+
+
+def format_associations(associations: list) -> str:
+    """Serializes the selected question associations (see crosstab.strongest_associations) compactly."""
+    lines = ["Associations (strongest first):"]
+    for entry in associations:
+        i, j = entry["questions"]
+        pairs = ", ".join(f"{a} + {b} ({count})" for a, b, count in entry["top_pairs"])
+        lines.append(f"Q{i + 1} x Q{j + 1}: V={entry['cramers_v']} (n={entry['n']}); top pairs: {pairs}")
+    return "\n".join(lines)
+
+
+def build_analysis_messages(survey: dict, results: dict, associations: list = None, max_options: int = 10) -> list:
+    """
+    Builds the analysis messages: fixed instructions as system prompt, the compact table
+    (plus the strongest question associations, if given) as user message.
+    """
+    content = format_results(survey, results, max_options)
+    if associations:
+        content += "\n\n" + format_associations(associations)
+    return [
+        {"role": "system", "content": ANALYSIS_INSTRUCTIONS},
+        {"role": "user", "content": content}
+    ]
+
+
+def legacy_prompt_tokens(survey: dict, results: dict, tokenizer=approximate_token_count) -> int:
+    """Estimates the size of the former prompt, which embedded repr(survey) once and repr(results) twice."""
+    return tokenizer(ANALYSIS_INSTRUCTIONS) + tokenizer(str(survey)) + 2 * tokenizer(str(results))
+
+
+def prompt_token_report(survey: dict, results: dict, messages: list, tokenizer=approximate_token_count) -> dict:
+    """Reports the estimated prompt tokens before (repr-based prompt) and after the compact serialization."""
+    before = legacy_prompt_tokens(survey, results, tokenizer)
+    after = sum(tokenizer(message["content"]) for message in messages)
+    return {
+        "before": before,
+        "after": after,
+        "saved_percent": round((1 - after / before) * 100, 1) if before else 0.0
+    }
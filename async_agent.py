@@ -0,0 +1,108 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from agent import SurveyAgent, MODEL, SCOPES
+from metrics import REGISTRY, STAGE_SECONDS
+
+
+@dataclass
+class AnalysisSpec:
+    """A survey to analyze: the response sheet and the survey definition it belongs to."""
+    spreadsheet_id: str
+    range_def: str
+    survey_file: str = "survey.json"
+
+
+@dataclass
+class AnalysisResult:
+    """Outcome of one analysis pipeline. On failure, analysis is None and error says why."""
+    spec: AnalysisSpec
+    aggregate: dict = None
+    analysis: str = None
+    error: str = None
+
+
+class AsyncSurveyAgent(SurveyAgent):
+    """
+    SurveyAgent variant that runs the fetch -> aggregate -> summarize pipeline for many surveys concurrently.
+    Sheets requests run in worker threads and LLM requests go through AsyncOpenAI,
+    so the wall-clock time for N surveys is close to that of the slowest one.
+    """
+
+    def __init__(self, openai_client=None, async_client=None, cache=None, llm_guard=None, sheets_guard=None):
+        super().__init__(openai_client=openai_client, cache=cache, llm_guard=llm_guard, sheets_guard=sheets_guard)
+        if async_client is None:
+            from openai import AsyncOpenAI
+            async_client = AsyncOpenAI(max_retries=0)
+        self.async_client = async_client
+
+    async def complete_async(self, messages: list, response_format=None) -> str:
+        """Non-blocking counterpart of SurveyAgent.complete, sharing the same cache."""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(MODEL, messages, response_format)
+            cached = self.cache.get(key)
+            REGISTRY.record_cache(cached is not None)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        if response_format is None:
+            response = await self.llm_guard.call_async(
+                self.async_client.chat.completions.create,
+                model=MODEL,
+                store=True,
+                messages=messages,
+            )
+        else:
+            response = await self.llm_guard.call_async(
+                self.async_client.beta.chat.completions.parse,
+                model=MODEL,
+                store=True,
+                messages=messages,
+                response_format=response_format,
+            )
+        REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - started, stage="llm_call")
+        REGISTRY.record_usage(MODEL, getattr(response, "usage", None))
+        content = response.choices[0].message.content
+
+        if key is not None:
+            self.cache.set(key, content)
+        return content
+
+    async def analyze(self, spec: AnalysisSpec, scopes=SCOPES) -> AnalysisResult:
+        """Runs fetch -> aggregate -> summarize for a single survey."""
+        survey = self.survey_store(spec.survey_file).load_dict()
+
+        rows = await asyncio.to_thread(self.fetch_rows, scopes, spec.spreadsheet_id, spec.range_def)
+        # Aggregating a large export takes a while (or forks workers), so it runs off the event loop.
+        results = await asyncio.to_thread(
+            self.aggregate_responses, rows, survey.get("title", ""), survey.get("introduction", "")
+        )
+        messages = self.build_analysis_messages(survey, results)
+        analysis = await self.complete_async(messages)
+        return AnalysisResult(spec=spec, aggregate=results, analysis=analysis)
+
+    async def analyze_many(self, specs: list, scopes=SCOPES, concurrency: int = 4,
+                           timeout: float = 120.0) -> list:
+        """
+        Analyzes all specs with at most `concurrency` pipelines in flight, each limited to `timeout` seconds.
+        Results are returned in the order of specs; failed or timed out pipelines carry an error instead.
+        """
+        # Authorize once up front; the pipelines then share the pooled Sheets services.
+        await asyncio.to_thread(self.get_credentials, scopes)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(spec):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.analyze(spec, scopes), timeout)
+                except asyncio.TimeoutError:
+                    error = f"timed out after {timeout} seconds"
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                print(f"An error occurred during analysis of {spec.spreadsheet_id} ({spec.range_def}): {error}")
+                return AnalysisResult(spec=spec, error=error)
+
+        return await asyncio.gather(*(run(spec) for spec in specs))
@@ -0,0 +1,192 @@
+import asyncio
+import copy
+import json
+import re
+import time
+
+from agent import MODEL
+from ratelimit import TokenBucket
+from survey import Survey
+
+FINAL_BATCH_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalizes a topic for deduplication: casefolded, single spaces, no surrounding punctuation."""
+    return re.sub(r"^\W+|\W+$", "", " ".join(topic.casefold().split()))
+
+
+def dedupe_topics(topics: list) -> dict:
+    """Maps every normalized topic to the first topic spelling it was requested with."""
+    unique = {}
+    for topic in topics:
+        unique.setdefault(normalize_topic(topic), topic)
+    return unique
+
+
+def parse_survey(content: str) -> dict:
+    """Validates a model response against the Survey model and returns it as dict."""
+    return Survey.model_validate_json(content).model_dump()
+
+
+def write_result(out, topic: str, survey: dict, error: str = None):
+    """Appends one result line to the JSONL output and flushes it, so finished work is never lost."""
+    line = {"topic": topic, "survey": survey}
+    if error:
+        line["error"] = error
+    out.write(json.dumps(line, separators=(',', ':')) + "\n")
+    out.flush()
+
+
+def strict_schema(model) -> dict:
+    """JSON schema of a Pydantic model in the form strict structured outputs require."""
+    schema = copy.deepcopy(model.model_json_schema())
+
+    def close(node):
+        if isinstance(node, dict):
+            if node.get("type") == "object":
+                node["additionalProperties"] = False
+            for value in node.values():
+                close(value)
+        elif isinstance(node, list):
+            for value in node:
+                close(value)
+
+    close(schema)
+    return schema
+
+
+async def generate_surveys_concurrently(agent, topics: dict, out, concurrency: int,
+                                        requests_per_minute: float) -> dict:
+    """Generates one survey per unique topic with bounded concurrency under a rate limit."""
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = TokenBucket(requests_per_minute / 60.0, capacity=concurrency)
+
+    async def run(key, topic):
+        async with semaphore:
+            await limiter.acquire_async()
+            try:
+                content = await agent.complete_async(agent.build_survey_messages(topic), response_format=Survey)
+                survey = parse_survey(content)
+                write_result(out, topic, survey)
+            except Exception as e:
+                print(f"An error occurred during survey generation for {topic!r}: {e}")
+                survey = None
+                write_result(out, topic, None, str(e) or type(e).__name__)
+            return key, survey
+
+    return dict(await asyncio.gather(*(run(key, topic) for key, topic in topics.items())))
+
+
+def submit_batch(client, guard, topics: dict, keys: list, build_messages) -> str:
+    """Uploads one structured-output request per topic (custom_id = index in keys) and starts the batch."""
+    lines = []
+    for i, key in enumerate(keys):
+        lines.append(json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": MODEL,
+                "messages": build_messages(topics[key]),
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": {"name": "Survey", "schema": strict_schema(Survey), "strict": True}
+                }
+            }
+        }, separators=(',', ':')))
+
+    # Bytes rather than a file object, so a retried upload sends the whole file again.
+    upload = guard.call(
+        client.files.create,
+        file=("surveys.jsonl", ("\n".join(lines) + "\n").encode("utf-8")),
+        purpose="batch"
+    )
+    return create_batch(client, guard, upload.id).id
+
+
+def create_batch(client, guard, input_file_id: str):
+    """
+    Starts the batch for an uploaded input file. batches.create is not idempotent: after a timeout or
+    a 5xx the batch may have been created anyway, so a retry first looks for a batch of the same
+    input file among the most recent ones instead of submitting (and paying for) a second batch.
+    """
+    attempted = False
+
+    def create():
+        nonlocal attempted
+        if attempted:
+            for batch in client.batches.list(limit=100).data:
+                if batch.input_file_id == input_file_id:
+                    return batch
+        attempted = True
+        return client.batches.create(
+            input_file_id=input_file_id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+
+    return guard.call(create)
+
+
+def generate_surveys_batch(agent, topics: dict, out, poll_interval: float = 30.0, sleep=time.sleep,
+                           batch_id: str = None) -> dict:
+    """
+    Generates the surveys through the OpenAI Batch API: uploads one JSONL request per topic,
+    polls the batch until it is done and collects, validates and writes the results.
+    Every API call goes through the agent's LLM guard, so transient errors during the (up to 24h)
+    polling are retried. The batch id is printed on submission; passing it as batch_id with the
+    same topics picks up a job whose process died, without submitting it again.
+    """
+    keys = list(topics)
+    client = agent.client
+    guard = agent.llm_guard
+    if batch_id is None:
+        batch_id = submit_batch(client, guard, topics, keys, agent.build_survey_messages)
+        print(f"Submitted batch {batch_id}; if this process stops, resume it with batch_id={batch_id!r}.")
+
+    batch = guard.call(client.batches.retrieve, batch_id)
+    while batch.status not in FINAL_BATCH_STATES:
+        sleep(poll_interval)
+        batch = guard.call(client.batches.retrieve, batch_id)
+
+    results = {key: None for key in keys}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in guard.call(client.files.content, file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            key = keys[int(record["custom_id"])]
+            response = record.get("response") or {}
+            try:
+                if record.get("error") or response.get("status_code") != 200:
+                    raise ValueError(record.get("error") or response.get("body", {}).get("error"))
+                content = response["body"]["choices"][0]["message"]["content"]
+                results[key] = parse_survey(content)
+                write_result(out, topics[key], results[key])
+            except Exception as e:
+                print(f"An error occurred during survey generation for {topics[key]!r}: {e}")
+                write_result(out, topics[key], None, str(e) or type(e).__name__)
+    if batch.status != "completed":
+        print(f"Batch {batch.id} ended with status {batch.status}.")
+    return results
+
+
+def generate_surveys(agent, topics: list, output_file: str = "surveys.jsonl", concurrency: int = 8,
+                     requests_per_minute: float = 300.0, use_batch_api: bool = False, **batch_options) -> dict:
+    """
+    Generates a survey for every topic. Topics that normalize to the same text are generated once.
+    Every finished survey is appended to output_file (JSON Lines) right away.
+    By default the requests run concurrently through the agent's async client (an AsyncSurveyAgent);
+    use_batch_api=True submits them as one OpenAI batch job instead, which is cheaper for large jobs.
+    Returns {topic: survey dict or None} for every requested topic.
+    """
+    unique = dedupe_topics(topics)
+    with open(output_file, "a", encoding="utf-8") as out:
+        if use_batch_api:
+            results = generate_surveys_batch(agent, unique, out, **batch_options)
+        else:
+            results = asyncio.run(generate_surveys_concurrently(agent, unique, out, concurrency, requests_per_minute))
+    return {topic: results.get(normalize_topic(topic)) for topic in topics}
@@ -0,0 +1,536 @@
+import argparse
+import asyncio
+import collections
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from aggregation import aggregate_columnar
+from parallel import aggregate_parallel
+
+
+def aggregate_loop(rows, title, description) -> dict:
+    """Reference implementation: one Counter per question column, walking every row each time."""
+    if not rows or len(rows) < 2:
+        return {"title": title, "description": description, "questions": []}
+
+    header = rows[0]
+    responses = rows[1:]
+    questions = header[1:]
+    analysis_list = []
+
+    for i, question in enumerate(questions, start=1):
+        counter = collections.Counter()
+        for response in responses:
+            if len(response) > i:
+                answer = response[i]
+                counter[answer] += 1
+
+        total = sum(counter.values())
+        distribution = []
+        for option, count in counter.items():
+            percentage = round((count / total) * 100, 2) if total > 0 else 0.0
+            distribution.append({
+                "option": option,
+                "count": count,
+                "percentage": percentage
+            })
+        most_common_answer = counter.most_common(1)[0][0] if total > 0 else None
+
+        analysis_list.append({
+            "question": question,
+            "analysis": {
+                "most_common_answer": most_common_answer,
+                "distribution": distribution
+            }
+        })
+
+    return {
+        "title": title,
+        "description": description,
+        "questions": analysis_list
+    }
+
+
+def make_rows(n_rows: int, n_questions: int, n_options: int, seed: int = 0) -> list:
+    """Generates a synthetic response sheet with a header row and a timestamp column."""
+    rng = random.Random(seed)
+    header = ["Zeitstempel"] + [f"Question {q + 1}" for q in range(n_questions)]
+    options = [f"Option {o + 1}" for o in range(n_options)]
+    rows = [header]
+    for r in range(n_rows):
+        row = [f"2025-01-01 00:00:{r % 60:02d}"] + rng.choices(options, k=n_questions)
+        # Sheets omits trailing empty cells, so some rows are shorter than the header.
+        rows.append(row[:rng.randint(n_questions // 2 + 1, n_questions + 1)] if r % 10 == 0 else row)
+    return rows
+
+
+def best_of(func, rows, repeat: int) -> float:
+    """Returns the fastest wall-clock time of several runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows, "", "")
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_aggregation(n_rows: int, n_questions: int, n_options: int, repeat: int):
+    """Compares the columnar aggregation engine against the per-column Counter loop."""
+    rows = make_rows(n_rows, n_questions, n_options)
+    assert aggregate_columnar(rows, "", "") == aggregate_loop(rows, "", ""), "results differ"
+
+    loop_time = best_of(aggregate_loop, rows, repeat)
+    columnar_time = best_of(aggregate_columnar, rows, repeat)
+    print(f"rows={n_rows} questions={n_questions} options={n_options}")
+    print(f"  loop:     {loop_time * 1000:9.2f} ms")
+    print(f"  columnar: {columnar_time * 1000:9.2f} ms  ({loop_time / columnar_time:.1f}x)")
+
+
+def bench_parallel(n_rows: int, n_questions: int, n_options: int, repeat: int, max_workers: int):
+    """Shows how sharded aggregation scales with the number of worker processes."""
+    rows = make_rows(n_rows, n_questions, n_options)
+    expected = aggregate_columnar(rows, "", "")
+    serial_time = best_of(aggregate_columnar, rows, repeat)
+    print(f"rows={n_rows} questions={n_questions} options={n_options} (cpus={os.cpu_count()})")
+    print(f"  serial:     {serial_time * 1000:9.2f} ms")
+
+    workers = 2
+    while workers <= max_workers:
+        def run(rows, title, description, workers=workers):
+            return aggregate_parallel(rows, title, description, workers=workers, min_rows=0)
+        assert run(rows, "", "") == expected, "results differ"
+        parallel_time = best_of(run, rows, repeat)
+        print(f"  workers={workers:<3} {parallel_time * 1000:9.2f} ms  ({serial_time / parallel_time:.1f}x)")
+        workers *= 2
+
+
+def make_survey(n_questions: int, n_options: int, seed: int = 0) -> dict:
+    """Generates a synthetic survey definition shaped like survey.json."""
+    rng = random.Random(seed)
+    words = ["Qualität", "Preis", "Design", "Service", "Alltag", "Zukunft", "Marke", "Technik"]
+    return {
+        "title": f"Synthetische Umfrage {seed}",
+        "introduction": "Eine generierte Umfrage für Benchmarks.",
+        "questions": [
+            {
+                "question": f"Frage {q + 1}: Wie wichtig ist {rng.choice(words)}?",
+                "options": [{"option": f"Antwort {q + 1}.{o + 1}"} for o in range(n_options)]
+            }
+            for q in range(n_questions)
+        ]
+    }
+
+
+def make_sheet(survey: dict, n_rows: int, skew: float = 1.0, missing: float = 0.05, seed: int = 0) -> list:
+    """
+    Generates the response sheet of a survey: header row plus n_rows responses.
+    Answers follow a Zipf-like distribution (weight 1 / rank**skew, 0 = uniform), a `missing` fraction
+    of the cells is left empty, and trailing empty cells are dropped like the Sheets API does.
+    """
+    rng = random.Random(seed)
+    header = ["Zeitstempel"] + [item["question"] for item in survey["questions"]]
+    columns = []
+    for item in survey["questions"]:
+        options = [option["option"] for option in item["options"]]
+        weights = [1.0 / (rank + 1) ** skew for rank in range(len(options))]
+        columns.append(rng.choices(options, weights=weights, k=n_rows))
+    rows = [header]
+    for r in range(n_rows):
+        row = [f"2025-01-01 {r // 3600 % 24:02d}:{r // 60 % 60:02d}:{r % 60:02d}"]
+        row += ["" if rng.random() < missing else column[r] for column in columns]
+        while len(row) > 1 and row[-1] == "":
+            row.pop()
+        rows.append(row)
+    return rows
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(func, repeat: int, units: int = 1, warmup: int = 1) -> dict:
+    """
+    Runs func repeatedly and reports p50/p99/mean latency in ms, throughput (units per second at p50)
+    and the peak memory traced by tracemalloc during one additional run.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50 = percentile(timings, 0.50)
+    return {
+        "runs": repeat,
+        "units": units,
+        "p50_ms": round(p50 * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "throughput_per_s": round(units / p50, 1) if p50 > 0 else None,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+class StubCompletions:
+    """
+    Stands in for client.chat.completions and beta.chat.completions: waits `latency` seconds, then answers
+    with `content`, or with `structured` when a response_format is requested.
+    """
+
+    def __init__(self, content: str, structured: str = None, latency: float = 0.0, chunk_size: int = 40):
+        self.content = content
+        self.structured = structured or content
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def usage(self, kwargs, content):
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in kwargs.get("messages", []))
+        return SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=len(content) // 4)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        content = self.structured if kwargs.get("response_format") else self.content
+        if kwargs.get("stream"):
+            return self.stream(kwargs, content)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self.usage(kwargs, content))
+
+    parse = create
+
+    def stream(self, kwargs, content):
+        for start in range(0, len(content), self.chunk_size):
+            delta = SimpleNamespace(content=content[start:start + self.chunk_size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=self.usage(kwargs, content))
+
+
+def stub_openai(content: str, structured: str = None, latency: float = 0.0) -> SimpleNamespace:
+    completions = StubCompletions(content, structured, latency)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions),
+                           beta=SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+
+class StubRequest:
+    def __init__(self, sheets, result):
+        self.sheets = sheets
+        self.result = result
+
+    def execute(self):
+        time.sleep(self.sheets.latency)
+        return self.result
+
+
+class StubSheets:
+    """Stands in for a Sheets service and its ServicePool: every range returns the same rows after `latency` seconds."""
+
+    def __init__(self, rows: list, latency: float = 0.0):
+        self.rows = rows
+        self.latency = latency
+        self.credentials = SimpleNamespace(get=lambda: None)
+
+    @contextlib.contextmanager
+    def service(self):
+        yield self
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range):
+        return StubRequest(self, {"range": range, "values": self.rows})
+
+    def batchGet(self, spreadsheetId, ranges):
+        return StubRequest(self, {"valueRanges": [{"range": r, "values": self.rows} for r in ranges]})
+
+
+def stub_agent(workdir: str, survey: dict, rows: list, analysis: str, llm_latency: float = 0.0,
+               sheets_latency: float = 0.0):
+    """A SurveyAgent wired to stub clients, without rate limits or retry sleeps."""
+    from agent import SurveyAgent
+    from chat_log import ChatHistoryLog
+    from resilience import Guard
+
+    survey_file = os.path.join(workdir, "survey.json")
+    with open(survey_file, "w") as f:
+        json.dump(survey, f, separators=(',', ':'))
+    agent = SurveyAgent(
+        openai_client=stub_openai(analysis, json.dumps(survey, separators=(',', ':')), llm_latency),
+        chat_log=ChatHistoryLog(os.path.join(workdir, "chat_history.jsonl")),
+        survey_file=survey_file,
+        llm_guard=Guard("stub-openai"),
+        sheets_guard=Guard("stub-sheets")
+    )
+    agent.pool = StubSheets(rows, sheets_latency)
+    return agent
+
+
+def run_suite(n_rows: int, n_questions: int, n_options: int, repeat: int, skew: float, missing: float,
+              llm_latency: float, sheets_latency: float, seed: int = 0) -> dict:
+    """Runs every workload and returns the results with the parameters and environment they were measured in."""
+    from analysis_prompt import build_analysis_messages
+    from chat_log import ChatHistoryLog
+    from survey import Survey
+
+    survey = make_survey(n_questions, n_options, seed)
+    rows = make_sheet(survey, n_rows, skew, missing, seed)
+    survey_json = json.dumps(survey, separators=(',', ':'))
+    results = aggregate_columnar(rows, survey["title"], survey["introduction"])
+    analysis = "## Overview\n" + "Die Antworten zeigen klare Präferenzen. " * 40
+    benchmarks = {}
+
+    print(f"rows={n_rows} questions={n_questions} options={n_options} skew={skew} missing={missing}")
+
+    def record(name, func, runs=repeat, units=1):
+        benchmarks[name] = measure(func, runs, units)
+        stats = benchmarks[name]
+        print(f"  {name:<28} p50 {stats['p50_ms']:9.3f} ms  p99 {stats['p99_ms']:9.3f} ms  "
+              f"{stats['throughput_per_s'] or 0:12.1f}/s  peak {stats['peak_memory_kb']:9.1f} KiB")
+
+    record("aggregate_loop", lambda: aggregate_loop(rows, "", ""), units=n_rows)
+    record("aggregate_columnar", lambda: aggregate_columnar(rows, "", ""), units=n_rows)
+    record("serialize_survey", lambda: json.loads(json.dumps(survey, separators=(',', ':'))), runs=repeat * 10)
+    record("validate_survey", lambda: Survey.model_validate_json(survey_json), runs=repeat * 10)
+    record("serialize_results", lambda: json.dumps(results, separators=(',', ':')), runs=repeat * 10)
+    record("build_analysis_prompt", lambda: build_analysis_messages(survey, results), runs=repeat * 10)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        messages = [{"role": "user" if i % 2 else "assistant", "content": survey if i % 4 == 0 else f"Änderung {i}"}
+                    for i in range(200)]
+        counter = iter(range(1 << 30))
+
+        def write_history(fsync):
+            log = ChatHistoryLog(os.path.join(workdir, f"history-{fsync}-{next(counter)}.jsonl"), fsync=fsync)
+            for message in messages:
+                log.append(message)
+            log.close()
+
+        record("chat_history_200_fsync", lambda: write_history(True), units=len(messages))
+        record("chat_history_200_nofsync", lambda: write_history(False), units=len(messages))
+
+        agent = stub_agent(workdir, survey, rows, analysis, llm_latency, sheets_latency)
+        record("end_to_end_analysis", lambda: "".join(agent.stream_survey_analysis()), units=n_rows)
+        record("end_to_end_generate", lambda: agent.generate_survey("Benchmark"))
+        agent.chat_log.close()
+
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "params": {
+            "rows": n_rows, "questions": n_questions, "options": n_options, "repeat": repeat, "skew": skew,
+            "missing": missing, "llm_latency": llm_latency, "sheets_latency": sheets_latency, "seed": seed,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: dict, current: dict):
+    """Prints the p50 change of every benchmark against an earlier result file."""
+    if previous.get("params") != current.get("params"):
+        print("Note: the previous run used different parameters.")
+    print(f"compared with {previous.get('commit')} ({previous.get('created')}):")
+    for name, stats in current["benchmarks"].items():
+        before = previous.get("benchmarks", {}).get(name)
+        if not before or not before["p50_ms"]:
+            continue
+        change = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+        print(f"  {name:<28} {before['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms  ({change:+.1f}%)")
+
+
+async def asgi_request(app, method: str, path: str, body: dict = None) -> tuple:
+    """Sends one request straight into an ASGI app (no sockets) and returns status and decoded JSON body."""
+    raw = json.dumps(body).encode("utf-8") if body is not None else b""
+    scope = {"type": "http", "method": method, "path": path, "headers": [(b"content-type", b"application/json")]}
+    sent = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": raw, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    status = sent[0]["status"]
+    content = b"".join(message.get("body", b"") for message in sent[1:])
+    return status, json.loads(content) if sent[0]["headers"][0][1] == b"application/json" else content
+
+
+def bench_service(n_requests: int, concurrency: int, max_llm_calls: int, n_rows: int, n_questions: int,
+                  n_options: int, llm_latency: float, sheets_latency: float, seed: int = 0) -> dict:
+    """
+    Load test of service.SurveyService against stub backends: `concurrency` clients send a mix of
+    generate, update, aggregate and analyze requests; reports throughput, latency and status codes.
+    """
+    from resilience import Guard
+    from service import SurveyService
+
+    survey = make_survey(n_questions, n_options, seed)
+    rows = make_sheet(survey, n_rows, seed=seed)
+    analysis = "## Overview\n" + "Die Antworten zeigen klare Präferenzen. " * 40
+    survey_json = json.dumps(survey, separators=(',', ':'))
+    patch_json = json.dumps({"edits": [{"op": "set_title", "question": None, "option": None,
+                                        "text": "Neuer Titel", "options": None}]})
+
+    async def run(workdir):
+        survey_file = os.path.join(workdir, "survey.json")
+        with open(survey_file, "w") as f:
+            f.write(survey_json)
+        client = stub_openai(analysis, survey_json, llm_latency)
+        completions = client.chat.completions
+        parse = completions.parse
+
+        def parse_by_format(**kwargs):
+            # Edits ask for a SurveyPatch, generation for a Survey.
+            if kwargs.get("response_format") is not None and kwargs["response_format"].__name__ == "SurveyPatch":
+                time.sleep(completions.latency)
+                message = SimpleNamespace(content=patch_json)
+                return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+            return parse(**kwargs)
+        client.beta.chat.completions = SimpleNamespace(parse=parse_by_format)
+
+        service = SurveyService(
+            openai_client=client, llm_guard=Guard("stub-openai"), sheets_guard=Guard("stub-sheets"),
+            pool=StubSheets(rows, sheets_latency), survey_file=survey_file,
+            sessions_dir=os.path.join(workdir, "sessions"), max_llm_calls=max_llm_calls,
+            max_waiting=max(concurrency, 1) * 4
+        )
+        latencies = collections.defaultdict(list)
+        statuses = collections.Counter()
+        counter = iter(range(n_requests))
+
+        async def client_loop(c):
+            session_id = None
+            for i in counter:
+                kind = ("generate", "update", "aggregate", "analyze")[(i + c) % 4]
+                if kind == "generate" or session_id is None and kind == "update":
+                    kind, body = "generate", {"topic": f"Thema {i % 20}", "session_id": session_id}
+                elif kind == "update":
+                    body = {"modifications": "Kürzerer Titel", "session_id": session_id}
+                else:
+                    body = {"spreadsheet_id": f"sheet-{i % 3}", "range": "A:Z"}
+                start = time.perf_counter()
+                status, payload = await asgi_request(service, "POST", "/" + kind, body)
+                latencies[kind].append(time.perf_counter() - start)
+                statuses[status] += 1
+                if kind == "generate" and status == 200:
+                    session_id = payload["session_id"]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(c) for c in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        service.close()
+        return elapsed, latencies, statuses, len(service.sessions)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        elapsed, latencies, statuses, sessions = asyncio.run(run(workdir))
+
+    report = {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "max_llm_calls": max_llm_calls,
+        "seconds": round(elapsed, 3),
+        "throughput_per_s": round(n_requests / elapsed, 1),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "sessions": sessions,
+        "endpoints": {},
+    }
+    print(f"requests={n_requests} concurrency={concurrency} max_llm_calls={max_llm_calls} "
+          f"llm_latency={llm_latency} sheets_latency={sheets_latency}")
+    print(f"  {report['throughput_per_s']:.1f} requests/s, statuses {report['statuses']}")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        report["endpoints"][kind] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        }
+        stats = report["endpoints"][kind]
+        print(f"  /{kind:<10} n={stats['count']:<6} p50 {stats['p50_ms']:9.3f} ms  p99 {stats['p99_ms']:9.3f} ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the survey response aggregation.")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--options", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="also benchmark sharded aggregation with 2, 4, ... up to this many processes")
+    parser.add_argument("--suite", action="store_true",
+                        help="run all workloads (aggregation, serialization, chat history, end-to-end analysis)")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the answer distribution")
+    parser.add_argument("--missing", type=float, default=0.05, help="fraction of empty cells")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub OpenAI client waits")
+    parser.add_argument("--sheets-latency", type=float, default=0.0, help="seconds the stub Sheets client waits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results",
+                        help="directory the suite writes its JSON result file to")
+    parser.add_argument("--compare", help="earlier suite result file to compare against")
+    parser.add_argument("--service", type=int, default=0, metavar="REQUESTS",
+                        help="load test the HTTP service with this many requests against stub backends")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients of the service load test")
+    parser.add_argument("--llm-calls", type=int, default=4, help="LLM concurrency cap of the service")
+    args = parser.parse_args()
+
+    if args.service:
+        bench_service(args.service, args.concurrency, args.llm_calls, args.rows, args.questions, args.options,
+                      args.llm_latency, args.sheets_latency, args.seed)
+    elif args.suite:
+        report = run_suite(args.rows, args.questions, args.options, args.repeat, args.skew, args.missing,
+                           args.llm_latency, args.sheets_latency, args.seed)
+        os.makedirs(args.output, exist_ok=True)
+        stamp = report["created"].replace(":", "").replace("+0000", "Z")
+        path = os.path.join(args.output, f"{stamp}-{report['commit'] or 'nogit'}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {path}")
+        if args.compare:
+            with open(args.compare, "r") as f:
+                compare(json.load(f), report)
+    else:
+        bench_aggregation(args.rows, args.questions, args.options, args.repeat)
+        if args.workers > 1:
+            bench_parallel(args.rows, args.questions, args.options, args.repeat, args.workers)
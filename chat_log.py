@@ -0,0 +1,108 @@
+import atexit
+import json
+import os
+
+
+class ChatHistoryLog:
+    """
+    Append-only chat history stored as JSON Lines (one message per line).
+    Messages are buffered and written + fsynced in batches of `flush_every`, so the cost per message is constant.
+    A final line torn by a crash is cut off when the log is reopened. The exit hook flushing pending
+    messages is registered by the first append and removed by close(), so closed logs can be garbage collected.
+    """
+
+    def __init__(self, path: str = "chat_history.jsonl", flush_every: int = 8, fsync: bool = True):
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync = fsync
+        self.buffer = []
+        self.file = None
+        self.at_exit = False
+
+    def open(self):
+        """Opens the log for appending, repairing a torn final line first."""
+        if self.file is None:
+            self.recover()
+            self.file = open(self.path, "a", encoding="utf-8")
+        return self.file
+
+    def recover(self):
+        """Truncates the log after its last complete line."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size
+            end = 0
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                index = f.read(step).rfind(b"\n")
+                if index != -1:
+                    end = pos + index + 1
+                    break
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, message: dict):
+        """Adds a message to the log. It reaches the disk with the next batch."""
+        self.buffer.append(json.dumps(message, separators=(',', ':')) + "\n")
+        if not self.at_exit:
+            atexit.register(self.close)
+            self.at_exit = True
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered messages and syncs them to disk."""
+        if not self.buffer:
+            return
+        f = self.open()
+        f.write("".join(self.buffer))
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self.buffer.clear()
+
+    def close(self):
+        """Flushes pending messages and closes the file."""
+        try:
+            self.flush()
+        finally:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            if self.at_exit:
+                atexit.unregister(self.close)
+                self.at_exit = False
+
+    def __iter__(self):
+        """Lazily reads the logged messages, including those still buffered."""
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break  # Torn final line, not yet recovered.
+                    if line.strip():
+                        yield json.loads(line)
+        for line in list(self.buffer):
+            yield json.loads(line)
+
+    def compact(self, filename: str):
+        """Writes the whole history as one compact JSON list (the chat_history.json format)."""
+        tmp_file = filename + ".tmp"
+        with open(tmp_file, "w") as f:
+            f.write("[")
+            for i, message in enumerate(self):
+                if i:
+                    f.write(",")
+                json.dump(message, f, separators=(',', ':'))
+            f.write("]")
+        os.replace(tmp_file, filename)
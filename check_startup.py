@@ -0,0 +1,94 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that make startup slow and that the CLI must only load when a command actually needs them.
+HEAVY_MODULES = ("openai", "numpy", "googleapiclient", "google_auth_oauthlib", "google.auth", "google.oauth2")
+
+# Import times are compared with that of `import openai`, measured in the same run on the same machine,
+# so the limits hold on fast and slow machines alike.
+REFERENCE = "import openai"
+
+CHECKS = {
+    # name: (code to run, heavy modules it may load, max import time relative to the reference or None)
+    "cli": ("import main", (), 0.5),
+    "generate": ("import main, agent; agent.default_client()", ("openai",), 1.5),
+    "analyze": ("import main, agent, sources, aggregation, parallel, crosstab", ("numpy",), 0.75),
+}
+
+
+def import_time(code: str) -> tuple:
+    """
+    Runs code in a fresh interpreter with -X importtime and returns the total import time in ms
+    (sum of the cumulative times of the top-level imports) and the heavy modules it loaded.
+    """
+    report = f"import sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "startup-check"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{code}\n{report}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # Nested imports are already part of their parent's cumulative time.
+            total += int(cumulative)
+    loaded = [module for module in result.stdout.strip().split(",") if module]
+    return total / 1000.0, loaded
+
+
+def best_time(code: str, runs: int) -> tuple:
+    """Best-of-runs import time of code and the heavy modules it loaded."""
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        ms, loaded = import_time(code)
+        timings.append(ms)
+    return min(timings), loaded
+
+
+def measure(runs: int) -> dict:
+    """Best-of-runs import time, loaded heavy modules and time relative to the reference of every check."""
+    reference, _ = best_time(REFERENCE, runs)
+    results = {}
+    for name, (code, _, _) in CHECKS.items():
+        ms, loaded = best_time(code, runs)
+        results[name] = {"ms": round(ms, 1), "ratio": round(ms / reference, 2), "loaded": loaded}
+    return results
+
+
+def check(results: dict) -> list:
+    """Returns the failures: unexpected heavy imports and import times above their share of the reference."""
+    failures = []
+    for name, (_, allowed, max_ratio) in CHECKS.items():
+        unexpected = [module for module in results[name]["loaded"] if module not in allowed]
+        if unexpected:
+            failures.append(f"{name}: imports {', '.join(unexpected)} at startup")
+        if max_ratio is not None and results[name]["ratio"] > max_ratio:
+            failures.append(f"{name}: import time {results[name]['ratio']:.2f}x that of {REFERENCE!r}, "
+                            f"allowed {max_ratio:.2f}x")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fails if the CLI imports heavy modules at startup or its import time regressed."
+    )
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per check (best time counts)")
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+    for name, result in results.items():
+        print(f"{name:<10} {result['ms']:8.1f} ms  {result['ratio']:5.2f}x {REFERENCE!r}  "
+              f"heavy modules: {', '.join(result['loaded']) or '-'}")
+
+    failures = check(results)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
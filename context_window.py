@@ -0,0 +1,70 @@
+import collections
+import json
+
+MESSAGE_OVERHEAD = 4  # Tokens the chat format adds around every message.
+
+
+def approximate_token_count(text: str) -> int:
+    """Rough token estimate (about four characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+class ContextWindow:
+    """
+    Token-budgeted window over the recent chat history.
+    Token counts are computed once per message when it is added. When the window exceeds `budget`,
+    the oldest turns are dropped; user turns leave a one-line trace in a running summary
+    that is itself capped at `summary_budget` tokens.
+    """
+
+    def __init__(self, budget: int = 1000, summary_budget: int = 200, tokenizer=approximate_token_count,
+                 summary_chars: int = 120):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.tokenizer = tokenizer
+        self.summary_chars = summary_chars
+        self.turns = collections.deque()
+        self.tokens = 0
+        self.summary = collections.deque()
+        self.summary_tokens = 0
+
+    def count(self, text: str) -> int:
+        return self.tokenizer(text) + MESSAGE_OVERHEAD
+
+    def add(self, role: str, content):
+        """Adds a turn to the window, evicting the oldest turns beyond the budget."""
+        if not isinstance(content, str):
+            content = json.dumps(content, separators=(',', ':'))
+        tokens = self.count(content)
+        self.turns.append((role, content, tokens))
+        self.tokens += tokens
+        while self.tokens > self.budget and self.turns:
+            self.evict()
+
+    def evict(self):
+        """Drops the oldest turn, keeping a short trace of user instructions in the summary."""
+        role, content, tokens = self.turns.popleft()
+        self.tokens -= tokens
+        if role != "user":
+            return
+        line = "- " + " ".join(content.split())[:self.summary_chars]
+        line_tokens = self.tokenizer(line)
+        self.summary.append((line, line_tokens))
+        self.summary_tokens += line_tokens
+        while self.summary_tokens > self.summary_budget and self.summary:
+            self.summary_tokens -= self.summary.popleft()[1]
+
+    def total_tokens(self) -> int:
+        """Tokens of the history part of the prompt (summary and recent turns)."""
+        summary = self.summary_tokens + MESSAGE_OVERHEAD if self.summary else 0
+        return self.tokens + summary
+
+    def build_messages(self, system_prompt: str, user_prompt: str) -> list:
+        """Builds the messages list: system prompt, summary of older turns, recent turns, new request."""
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            lines = "\n".join(line for line, _ in self.summary)
+            messages.append({"role": "system", "content": f"Earlier requests in this session:\n{lines}"})
+        messages.extend({"role": role, "content": content} for role, content, _ in self.turns)
+        messages.append({"role": "user", "content": user_prompt})
+        return messages
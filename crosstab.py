@@ -0,0 +1,106 @@
+import itertools
+import math
+
+import numpy as np
+
+
+def contingency_table(codes_a, codes_b):
+    """
+    Counts every answer combination of two encoded questions, skipping responses missing either answer.
+    Returns the table over the answers that occur, with the category codes of its rows and columns.
+    """
+    codes_a = np.asarray(codes_a, dtype=np.intp)
+    codes_b = np.asarray(codes_b, dtype=np.intp)
+    both = (codes_a >= 0) & (codes_b >= 0)
+    rows, row_index = np.unique(codes_a[both], return_inverse=True)
+    columns, column_index = np.unique(codes_b[both], return_inverse=True)
+    cells, counts = np.unique(row_index * len(columns) + column_index, return_counts=True)
+    table = np.zeros((len(rows), len(columns)), dtype=np.int64)
+    table.flat[cells] = counts
+    return table, rows, columns
+
+
+def association(table) -> dict:
+    """
+    Chi-square statistic and bias-corrected Cramér's V (Bergsma 2013) of a contingency table
+    without empty rows or columns. The correction pulls V of sparse tables towards 0, so
+    questions with many rarely chosen answers do not look associated with everything.
+    """
+    n = int(table.sum())
+    rows, columns = table.shape
+    if n < 2 or rows < 2 or columns < 2:
+        return {"n": n, "chi2": 0.0, "cramers_v": 0.0, "expected_per_cell": 0.0}
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+    chi2 = float(((table - expected) ** 2 / expected).sum())
+    phi2 = max(chi2 / n - (rows - 1) * (columns - 1) / (n - 1), 0.0)
+    rows_corrected = rows - (rows - 1) ** 2 / (n - 1)
+    columns_corrected = columns - (columns - 1) ** 2 / (n - 1)
+    denominator = min(rows_corrected, columns_corrected) - 1
+    cramers_v = math.sqrt(phi2 / denominator) if denominator > 0 else 0.0
+    return {
+        "n": n,
+        "chi2": round(chi2, 3),
+        "cramers_v": round(min(cramers_v, 1.0), 3),
+        "expected_per_cell": round(n / (rows * columns), 3)
+    }
+
+
+def top_pairs(table, categories_a: list, categories_b: list, rows, columns, k: int = 3) -> list:
+    """Returns the k most frequent answer combinations as (answer_a, answer_b, count)."""
+    flat = table.ravel()
+    k = min(k, int(np.count_nonzero(flat)))
+    if k == 0:
+        return []
+    order = np.argsort(flat, kind="stable")[::-1][:k]
+    n_b = table.shape[1]
+    return [(categories_a[rows[i // n_b]], categories_b[columns[i % n_b]], int(flat[i])) for i in order]
+
+
+def tabulable(codes, categories: list, max_categories: int, max_category_ratio: float) -> bool:
+    """
+    Checks whether a question is categorical enough to cross-tabulate. Free text, e-mail addresses
+    and similar columns have about one category per response and would look associated with everything.
+    """
+    answered = int(np.count_nonzero(np.asarray(codes) >= 0))
+    return 2 <= len(categories) <= max_categories and len(categories) <= answered * max_category_ratio
+
+
+def cross_tabulate(questions: list, encoded: list, k: int = 3, max_categories: int = 50,
+                   max_category_ratio: float = 0.5) -> list:
+    """
+    Computes the contingency table, association scores and top answer pairs for every pair of questions.
+    encoded holds (codes, categories) per question, as produced by aggregation.encode_columns.
+    Questions with more than max_categories answers, or more than max_category_ratio answers
+    per response (free text), are skipped.
+    """
+    usable = [
+        (i, column) for i, column in enumerate(encoded)
+        if tabulable(column[0], column[1], max_categories, max_category_ratio)
+    ]
+    results = []
+    for (i, (codes_a, categories_a)), (j, (codes_b, categories_b)) in itertools.combinations(usable, 2):
+        table, rows, columns = contingency_table(codes_a, codes_b)
+        entry = {
+            "questions": (i, j),
+            "question_texts": (questions[i], questions[j]),
+            "top_pairs": top_pairs(table, categories_a, categories_b, rows, columns, k)
+        }
+        entry.update(association(table))
+        results.append(entry)
+    return results
+
+
+def strongest_associations(questions: list, encoded: list, top: int = 3, min_cramers_v: float = 0.2,
+                           min_n: int = 10, min_expected: float = 2.0, k: int = 3) -> list:
+    """
+    Selects the `top` most strongly associated question pairs (by bias-corrected Cramér's V),
+    ignoring weak (below min_cramers_v) and sparse (fewer than min_n responses, or fewer than
+    min_expected responses per table cell on average) pairs.
+    """
+    candidates = [
+        entry for entry in cross_tabulate(questions, encoded, k)
+        if entry["cramers_v"] >= min_cramers_v and entry["n"] >= min_n
+        and entry["expected_per_cell"] >= min_expected
+    ]
+    candidates.sort(key=lambda entry: entry["cramers_v"], reverse=True)
+    return candidates[:top]
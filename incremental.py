@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import re
+
+from aggregation import count_responses, merge_counters, summarize_counts
+
+
+def split_range(range_def: str):
+    """Splits an A1 range like "Formularantworten 1!A:F" into sheet name, first and last column."""
+    sheet_name, _, cells = range_def.rpartition("!")
+    start, _, end = cells.partition(":")
+    start_col = re.sub(r"\d", "", start)
+    end_col = re.sub(r"\d", "", end) or start_col
+    return sheet_name, start_col, end_col
+
+
+def make_range(range_def: str, first_row: int, last_row: int = None) -> str:
+    """Builds an A1 range over the columns of range_def, e.g. "Formularantworten 1!A5:F"."""
+    sheet_name, start_col, end_col = split_range(range_def)
+    prefix = f"{sheet_name}!" if sheet_name else ""
+    return f"{prefix}{start_col}{first_row}:{end_col}{last_row if last_row is not None else ''}"
+
+
+def row_hash(row: list) -> str:
+    """Fingerprint of a sheet row, used to notice edits or deletions above the cursor."""
+    return hashlib.sha1(json.dumps(row, separators=(',', ':')).encode("utf-8")).hexdigest()
+
+
+class IncrementalAggregator:
+    """
+    Keeps running per-question counters for an append-only response sheet.
+    The state (sheet, header, last processed row and counters) is persisted to a JSON file,
+    so a refresh only has to fetch and count the rows added since the previous run.
+    """
+
+    def __init__(self, state_file: str = "aggregation_state.json"):
+        self.state_file = state_file
+        self.clear()
+        self.load()
+
+    def clear(self):
+        """Forgets all processed rows."""
+        self.spreadsheet_id = None
+        self.range_def = None
+        self.header = []
+        self.last_row = 1  # The header occupies the first row of the sheet.
+        self.last_row_hash = None
+        self.counters = []
+
+    def reset(self, spreadsheet_id: str, range_def: str, header: list):
+        """Starts counting from scratch for the given sheet and header row."""
+        self.clear()
+        self.spreadsheet_id = spreadsheet_id
+        self.range_def = range_def
+        self.header = list(header)
+        self.counters = [{} for _ in header[1:]]
+
+    def needs_rebuild(self, spreadsheet_id: str, range_def: str, header: list, last_row: list = None) -> bool:
+        """
+        Checks whether the stored counters belong to a different sheet or header row,
+        or (if the current content of the last processed row is given) whether that row changed.
+        """
+        return (
+            self.spreadsheet_id != spreadsheet_id
+            or self.range_def != range_def
+            or self.header != list(header)
+            or (last_row is not None and self.last_row > 1 and self.last_row_hash != row_hash(last_row))
+        )
+
+    def update(self, rows: list):
+        """Folds newly appended response rows (without header) into the running counters."""
+        merge_counters(self.counters, count_responses(rows, len(self.counters)))
+        self.last_row += len(rows)
+        if rows:
+            self.last_row_hash = row_hash(rows[-1])
+
+    def result(self, title: str, description: str) -> dict:
+        """Returns the aggregate in the same format as SurveyAgent.aggregate_responses."""
+        if self.last_row < 2:
+            return {"title": title, "description": description, "questions": []}
+
+        analysis_list = [
+            summarize_counts(question, list(counter), list(counter.values()))
+            for question, counter in zip(self.header[1:], self.counters)
+        ]
+        return {
+            "title": title,
+            "description": description,
+            "questions": analysis_list
+        }
+
+    def load(self):
+        """Loads the persisted state, if any."""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except Exception as e:
+            print("Error loading aggregation state JSON:", e)
+            return
+        self.spreadsheet_id = state.get("spreadsheet_id")
+        self.range_def = state.get("range_def")
+        self.header = state.get("header", [])
+        self.last_row = state.get("last_row", 1)
+        self.last_row_hash = state.get("last_row_hash")
+        self.counters = state.get("counters", [])
+
+    def save(self):
+        """Persists the state atomically, so a crash never leaves a half-written file."""
+        state = {
+            "spreadsheet_id": self.spreadsheet_id,
+            "range_def": self.range_def,
+            "header": self.header,
+            "last_row": self.last_row,
+            "last_row_hash": self.last_row_hash,
+            "counters": self.counters
+        }
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_file, self.state_file)
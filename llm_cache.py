@@ -0,0 +1,127 @@
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM responses, keyed on a hash of (model, messages, response_format schema).
+    The first tier is an in-memory LRU, the optional second tier a SQLite file that survives restarts.
+    Entries expire after ttl seconds (None keeps them forever) and each tier is capped in size.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 256, max_disk_entries: int = 10000,
+                 ttl: float = None, clock=time.time):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.memory = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self.db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: list, response_format=None) -> str:
+        """Hashes everything that determines the model output into a cache key."""
+        schema = response_format.model_json_schema() if response_format is not None else None
+        payload = json.dumps(
+            {"model": model, "messages": messages, "response_format": schema},
+            sort_keys=True,
+            separators=(',', ':'),
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def expired(self, created: float) -> bool:
+        return self.ttl is not None and self.clock() - created > self.ttl
+
+    def get(self, key: str):
+        """Returns the cached response for key, or None on a miss."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self.expired(created):
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self.expired(created):
+                        self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (self.clock(), key))
+                        self.db.commit()
+                        self.remember(key, created, value)
+                        self.hits += 1
+                        return value
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """Stores a response in both tiers, evicting the least recently used entries if needed."""
+        now = self.clock()
+        with self.lock:
+            self.remember(key, now, value)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self.db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self.db.commit()
+
+    def remember(self, key: str, created: float, value: str):
+        """Puts an entry into the memory tier (caller holds the lock)."""
+        self.memory[key] = (created, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def clear(self):
+        """Drops all cached responses and resets the counters."""
+        with self.lock:
+            self.memory.clear()
+            self.hits = 0
+            self.misses = 0
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the number of entries per tier."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            disk_entries = 0
+            if self.db is not None:
+                disk_entries = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_entries": disk_entries
+            }
@@ -1,10 +1,54 @@
 from agent import SurveyAgent
+from llm_cache import LLMCache
+from resilience import ServiceError
+from metrics import REGISTRY, enable as enable_metrics
+import argparse
 import json
+import os
 
-def main():
+# Modules only some commands need (Sheets, numpy, asyncio pipelines) are imported inside those commands,
+# so `python main.py generate` starts without them. Check the startup cost with check_startup.py.
+COMMANDS = ("generate", "edit", "analyze", "watch", "multi")
+
+def main(argv=None):
     """Entry point for the survey agent application."""
+
+    parser = argparse.ArgumentParser(description="Generates, edits and analyzes surveys.")
+    parser.add_argument("command", nargs="?", default="analyze", choices=COMMANDS,
+                        help="generate a new survey, edit survey.json, analyze the responses (default), "
+                             "watch the responses and re-analyze when they shift, or analyze several surveys "
+                             "listed in --specs at once (multi)")
+    parser.add_argument("--specs", default="analysis_specs.json",
+                        help='JSON list of surveys for multi: [{"spreadsheet_id": ..., "range_def": ..., '
+                             '"survey_file": ...}, ...] (survey_file defaults to survey.json)')
+    parser.add_argument("--concurrency", type=int, default=4, help="surveys analyzed at the same time by multi")
+    args = parser.parse_args(argv)
+
+    # Opt-in instrumentation: SURVEY_AGENT_METRICS=metrics.json (and SURVEY_AGENT_PROFILE=1 for cProfile
+    # dumps of the aggregation) records stage timings, token usage and cache hits and saves them on exit.
+    metrics_file = os.environ.get("SURVEY_AGENT_METRICS")
+    if metrics_file:
+        enable_metrics(profile=("aggregation",) if os.environ.get("SURVEY_AGENT_PROFILE") else ())
     
-    agent = SurveyAgent()
+    agent = SurveyAgent(cache=LLMCache("llm_cache.sqlite"))
+
+    def print_new_survey_parts(survey: dict, shown: int, complete: bool) -> int:
+        """Prints the parts of a (partial) survey that were not printed yet and returns the number printed."""
+        parts = []
+        if "title" in survey:
+            parts.append(f"Title: {survey['title']}")
+        if "introduction" in survey:
+            parts.append(f"Introduction: {survey['introduction']}")
+        questions = survey.get("questions", [])
+        if not complete:
+            questions = questions[:-1]  # The last question may still be receiving options.
+        for i, item in enumerate(questions, start=1):
+            options = ", ".join(option["option"] for option in item.get("options", []))
+            parts.append(f"{i}. {item.get('question', '')} ({options})")
+
+        for part in parts[shown:]:
+            print(part, flush=True)
+        return max(shown, len(parts))
 
     def run_survey_generator():
         """Runs the survey generator and enables post-generation edits."""
@@ -13,28 +57,59 @@ def main():
         
         topic = input("Enter survey topic: ").strip()
         agent.add_to_chat_history("user", topic)
-        agent.add_to_chat_history("assistant", "Generating survey...")
-        print(agent.chat_history[-1]["content"])
-        survey = agent.generate_survey(topic)
-        agent.save_survey(survey, "survey.json")
-        
+        print("Generating survey...")
+
         print("\n" + " Start of Generated Survey ".center(100, "=") + "\n")
-        print(survey)
+        survey_dict = None
+        shown = 0
+        try:
+            for snapshot in agent.stream_survey(topic):
+                survey_dict = snapshot
+                shown = print_new_survey_parts(snapshot, shown, complete=False)
+        except (ServiceError, ValueError) as e:
+            print(f"\nSurvey generation failed: {e}")
+            return
+        print_new_survey_parts(survey_dict, shown, complete=True)
         print("\n" + " End of Generated Survey ".center(100, "=") + "\n")
 
-        while True:
-            
-            modifications = input("Edit survey: ").strip()
-            agent.add_to_chat_history("user", modifications)
-            agent.add_to_chat_history("assistant", "Updating survey...")
-            print(agent.chat_history[-1]["content"])
+        survey = json.dumps(survey_dict)
+        agent.save_survey(survey, "survey.json")
+        edit_survey(survey)
+
+    def run_survey_editor():
+        """Edits the saved survey.json."""
+        print("\n" + " SURVEY EDITOR ".center(100, "=") + "\n")
+
+        survey = agent.survey_store("survey.json").load().model_dump_json()
+        print(survey)
+        edit_survey(survey)
+
+    def edit_survey(survey: str):
+        """Lets the user edit the survey until interrupted; every version is saved to survey.json."""
+        try:
+            while True:
+                
+                modifications = input("Edit survey (or undo/redo): ").strip()
+                if modifications.lower() in ("undo", "redo"):
+                    # Earlier versions are kept by the survey store, so no LLM call is needed.
+                    store = agent.survey_store("survey.json")
+                    restored = store.undo() if modifications.lower() == "undo" else store.redo()
+                    survey = restored.model_dump_json()
+                else:
+                    print("Updating survey...")
 
-            survey = agent.update_survey(survey, modifications)
-            agent.save_survey(survey, "survey.json")
+                    try:
+                        survey = agent.update_survey(survey, modifications, patch=True)
+                    except (ServiceError, ValueError) as e:
+                        print(f"Survey modification failed, keeping the current survey: {e}")
+                        continue
+                    agent.save_survey(survey, "survey.json")
 
-            print("\n" + " Start of Generated Survey ".center(100, "=") + "\n")
-            print(survey)
-            print("\n" + " End of Generated Survey ".center(100, "=") + "\n")
+                print("\n" + " Start of Generated Survey ".center(100, "=") + "\n")
+                print(survey)
+                print("\n" + " End of Generated Survey ".center(100, "=") + "\n")
+        finally:
+            agent.save_chat_history("chat_history.json")
 
     def run_survey_analysis():
         """Runs the survey analysis tool."""
@@ -42,20 +117,78 @@ def main():
 
         print("Fetching survey data...")
         print("Analyzing survey data...")
-        analysis = agent.generate_survey_analysis()
+
+        print("\n" + " Survey Analysis ".center(100, "=") + "\n")
+        chunks = []
+        try:
+            for i, chunk in enumerate(agent.stream_survey_analysis()):
+                if i == 0 and agent.prompt_report:
+                    report = agent.prompt_report
+                    print(f"(prompt: ~{report['after']} tokens, was ~{report['before']})\n")
+                chunks.append(chunk)
+                print(chunk.replace("\\n", "\n"), end="", flush=True)
+        except ServiceError as e:
+            print(f"\nSurvey analysis failed: {e}")
+            return
+        analysis = "".join(chunks)
         agent.save_analysis(analysis, "analysis.json")
+        print("\n" + " End of Survey Analysis ".center(100, "=") + "\n")
 
-        formatted_output = analysis.replace("\\n", "\n")
+    def run_survey_watch():
+        """Watches the response sheet and prints a fresh analysis whenever the answers shift noticeably."""
+        from agent import MY_SPREADSHEET_ID, MY_RANGE_NAME
+        from watch import SurveyWatcher
 
+        print("\n" + " SURVEY WATCH ".center(100, "=") + "\n")
 
-        print("\n" + " Survey Analysis ".center(100, "=") + "\n")
-        print(formatted_output)
-        print("\n" + " End of Survey Analysis ".center(100, "=") + "\n")
+        def show(analysis):
+            agent.save_analysis(analysis, "analysis.json")
+            print("\n" + " Survey Analysis ".center(100, "=") + "\n")
+            print(analysis.replace("\\n", "\n"))
+            print("\n" + " End of Survey Analysis ".center(100, "=") + "\n")
+
+        print("Watching survey responses (Ctrl+C to stop)...")
+        SurveyWatcher(agent, MY_SPREADSHEET_ID, MY_RANGE_NAME, on_analysis=show).run()
+
+    def run_multi_survey_analysis():
+        """Analyzes the surveys listed in the --specs file concurrently and prints the analyses in order."""
+        import asyncio
+        from async_agent import AnalysisSpec, AsyncSurveyAgent
+
+        print("\n" + " MULTI SURVEY ANALYSIS ".center(100, "=") + "\n")
+
+        try:
+            with open(args.specs, "r") as f:
+                specs = [AnalysisSpec(**spec) for spec in json.load(f)]
+        except (OSError, ValueError, TypeError) as e:
+            print(f"An error occurred while reading the survey list {args.specs}: {e}")
+            return
+
+        print(f"Analyzing {len(specs)} surveys...")
+        async_agent = AsyncSurveyAgent(cache=agent.cache, llm_guard=agent.llm_guard, sheets_guard=agent.sheets_guard)
+        results = asyncio.run(async_agent.analyze_many(specs, concurrency=args.concurrency))
 
+        for result in results:
+            title = f" {result.spec.spreadsheet_id} ({result.spec.range_def}) "
+            print("\n" + title.center(100, "=") + "\n")
+            if result.error:
+                print(f"Analysis failed: {result.error}")
+            else:
+                print(result.analysis.replace("\\n", "\n"))
+        print("\n" + " End of Survey Analyses ".center(100, "=") + "\n")
 
-    ####
-    #run_survey_generator()
-    run_survey_analysis()
+    commands = {
+        "generate": run_survey_generator,
+        "edit": run_survey_editor,
+        "analyze": run_survey_analysis,
+        "watch": run_survey_watch,
+        "multi": run_multi_survey_analysis,
+    }
+    try:
+        commands[args.command]()
+    finally:
+        if metrics_file:
+            REGISTRY.dump(metrics_file)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,239 @@
+import bisect
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+
+# USD per 1M tokens (input, output).
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = "survey_agent_stage_seconds"
+
+NULL_SPAN = contextlib.nullcontext()
+
+
+def label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram of one labelled metric (Prometheus semantics)."""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list:
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Span:
+    """Times a with block and records it as an observation of the stage histogram."""
+
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry, stage: str):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(STAGE_SECONDS, time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class MetricsRegistry:
+    """
+    In-process store of counters and histograms, exported as Prometheus text or JSON.
+    Disabled by default: span() then hands out a shared no-op context manager and the
+    record methods return right away, so instrumented code pays one attribute check.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self.profiled = set()
+        self.profile_dir = "."
+        self.profiles = 0
+        self.lock = threading.Lock()
+
+    def enable(self, profile: tuple = (), profile_dir: str = "."):
+        """Turns recording on. Stages listed in `profile` are additionally run under cProfile."""
+        self.enabled = True
+        self.profiled = set(profile)
+        self.profile_dir = profile_dir
+        return self
+
+    def disable(self):
+        self.enabled = False
+        self.profiled = set()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def span(self, stage: str):
+        """Context manager timing one stage (OAuth, Sheets fetch, aggregation, LLM call, ...)."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+
+    @contextlib.contextmanager
+    def profile(self, stage: str):
+        """Runs the with block under cProfile if the stage was enabled for profiling; writes <stage>-<n>.prof."""
+        if not self.enabled or stage not in self.profiled:
+            yield
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self.lock:
+                self.profiles += 1
+                number = self.profiles
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{stage}-{number}.prof"))
+
+    def record_usage(self, model: str, usage):
+        """Counts the tokens of an OpenAI `usage` object (or dict) and their cost in USD."""
+        if not self.enabled or usage is None:
+            return
+        if isinstance(usage, dict):
+            prompt_tokens = usage.get("prompt_tokens") or 0
+            completion_tokens = usage.get("completion_tokens") or 0
+        else:
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        self.inc("llm_requests_total", model=model)
+        self.inc("llm_tokens_total", prompt_tokens, model=model, kind="prompt")
+        self.inc("llm_tokens_total", completion_tokens, model=model, kind="completion")
+        input_price, output_price = PRICES.get(model, (0.0, 0.0))
+        cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+        self.inc("llm_cost_usd_total", cost, model=model)
+
+    def record_cache(self, hit: bool):
+        if not self.enabled:
+            return
+        self.inc("llm_cache_lookups_total", result="hit" if hit else "miss")
+
+    def cache_hit_rate(self) -> float:
+        hits = self.counters.get(("llm_cache_lookups_total", (("result", "hit"),)), 0)
+        misses = self.counters.get(("llm_cache_lookups_total", (("result", "miss"),)), 0)
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    def to_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            lines = []
+            seen = set()
+            for (name, key), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{format_labels(key)} {value:g}")
+            for (name, key), histogram in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} histogram")
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{format_labels(key + (('le', le),))} {count}")
+                lines.append(f"{name}_sum{format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for (name, key), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(key), "count": histogram.count, "sum": round(histogram.sum, 6),
+                     "buckets": {("+Inf" if bound == float("inf") else f"{bound:g}"): count
+                                 for bound, count in histogram.cumulative()}}
+                    for (name, key), histogram in sorted(self.histograms.items(), key=lambda item: item[0])
+                ],
+                "llm_cache_hit_rate": round(self.cache_hit_rate(), 4),
+            }
+
+    def dump(self, filename: str):
+        """Saves the metrics as JSON."""
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe(STAGE_SECONDS, "Wall-clock seconds spent per SurveyAgent stage.")
+REGISTRY.describe("llm_tokens_total", "Tokens reported in the OpenAI usage fields.")
+REGISTRY.describe("llm_cost_usd_total", "Estimated OpenAI cost in USD.")
+REGISTRY.describe("llm_cache_lookups_total", "LLM response cache lookups by result.")
+
+
+def enable(profile: tuple = (), profile_dir: str = ".") -> MetricsRegistry:
+    """Turns on the process-wide registry; e.g. enable(profile=("aggregation",)) also profiles aggregation."""
+    return REGISTRY.enable(profile, profile_dir)
+
+
+def span(stage: str):
+    return REGISTRY.span(stage)
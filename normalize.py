@@ -0,0 +1,141 @@
+import difflib
+import re
+
+from aggregation import summarize_counts
+
+OTHER = "Other"
+
+
+def normalize_text(text: str) -> str:
+    """Casefolds and trims an answer and collapses inner whitespace."""
+    return " ".join(str(text).casefold().split())
+
+
+def numbered_tokens(text: str) -> list:
+    """The words of a text that contain a digit ("m3", "x5", "1980er"), which a typo fix must never change."""
+    return sorted(token for token in re.findall(r"\w+", text) if any(char.isdigit() for char in token))
+
+
+def close_match(text: str, candidates, cutoff: float = 0.8, margin: float = 0.1):
+    """
+    Returns the candidate a (normalized) text is a typo of, or None. Accepted are only candidates
+    with a difflib ratio >= cutoff, the same numbered words (so "bmw m4" never becomes "bmw m3",
+    nor "1990er" "1980er"), and a ratio at least `margin` above that of the runner-up.
+    """
+    numbers = numbered_tokens(text)
+    floor = cutoff - margin  # Candidates below this can neither match nor be a close runner-up.
+    scores = []
+    for candidate in candidates:
+        matcher = difflib.SequenceMatcher(None, text, candidate)
+        if matcher.real_quick_ratio() >= floor and matcher.quick_ratio() >= floor:
+            scores.append((matcher.ratio(), candidate))
+    scores.sort(reverse=True)
+    if not scores or scores[0][0] < cutoff or numbered_tokens(scores[0][1]) != numbers:
+        return None
+    if len(scores) > 1 and scores[0][0] - scores[1][0] < margin:
+        return None  # Ambiguous: close to two options.
+    return scores[0][1]
+
+
+class OptionIndex:
+    """
+    Maps raw answers of one question to its canonical answer options (Item.options).
+    Lookup order: exact match of the normalized answer, multi-select split on commas,
+    fuzzy match for typos (see close_match). Whatever does not match goes to the "Other" bucket.
+    Results are memoized per distinct raw answer, so the work scales with the number of unique answers.
+    """
+
+    def __init__(self, options: list, cutoff: float = 0.8, separator: str = ",", margin: float = 0.1):
+        self.options = list(options)
+        self.exact = {}
+        for option in self.options:
+            self.exact.setdefault(normalize_text(option), option)
+        self.cutoff = cutoff
+        self.margin = margin
+        self.separator = separator
+        self.memo = {}
+
+    def fuzzy(self, normalized: str):
+        match = close_match(normalized, self.exact, self.cutoff, self.margin)
+        return self.exact[match] if match is not None else None
+
+    def lookup(self, normalized: str):
+        return self.exact.get(normalized) or self.fuzzy(normalized)
+
+    def match(self, raw: str) -> list:
+        """Returns the canonical options a raw answer stands for (empty list: "Other")."""
+        matched = self.memo.get(raw)
+        if matched is None:
+            matched = self.resolve(raw)
+            self.memo[raw] = matched
+        return matched
+
+    def resolve(self, raw: str) -> list:
+        normalized = normalize_text(raw)
+        if not normalized:
+            return []
+        option = self.exact.get(normalized)
+        if option is not None:
+            return [option]
+        if self.separator in normalized:
+            parts = [part.strip() for part in normalized.split(self.separator) if part.strip()]
+            matched = [self.lookup(part) for part in parts]
+            if all(matched):
+                return list(dict.fromkeys(matched))
+        option = self.fuzzy(normalized)
+        return [option] if option is not None else []
+
+
+class SurveyNormalizer:
+    """Normalizes aggregated results against the answer options of a survey definition."""
+
+    def __init__(self, survey: dict, cutoff: float = 0.8):
+        self.cutoff = cutoff
+        self.indexes = {}
+        for item in survey.get("questions", []):
+            options = [option["option"] for option in item.get("options", [])]
+            self.indexes[normalize_text(item["question"])] = OptionIndex(options, cutoff)
+        self.question_memo = {}
+
+    def index_for(self, question: str):
+        """Finds the option index of a sheet column header (exact, then fuzzy question match)."""
+        if question not in self.question_memo:
+            normalized = normalize_text(question)
+            index = self.indexes.get(normalized)
+            if index is None:
+                match = close_match(normalized, self.indexes, self.cutoff)
+                index = self.indexes[match] if match is not None else None
+            self.question_memo[question] = index
+        return self.question_memo[question]
+
+    def normalize_question(self, entry: dict) -> dict:
+        """Re-buckets one question's distribution onto the canonical options, plus an "Other" bucket."""
+        index = self.index_for(entry["question"])
+        if index is None:
+            return entry
+
+        counts = dict.fromkeys(index.options, 0)
+        other_answers = {}
+        for bucket in entry["analysis"]["distribution"]:
+            if not normalize_text(bucket["option"]):
+                continue  # A blank cell is no answer, not an "Other" answer.
+            matched = index.match(bucket["option"])
+            for option in matched:
+                counts[option] += bucket["count"]
+            if not matched:
+                other_answers[bucket["option"]] = bucket["count"]
+        if other_answers:
+            counts[OTHER] = counts.get(OTHER, 0) + sum(other_answers.values())
+
+        normalized = summarize_counts(entry["question"], list(counts), list(counts.values()))
+        if other_answers:
+            normalized["analysis"]["other_answers"] = other_answers
+        return normalized
+
+    def normalize(self, results: dict) -> dict:
+        """Returns a copy of the aggregated results with every question normalized."""
+        if not results:
+            return results
+        normalized = dict(results)
+        normalized["questions"] = [self.normalize_question(entry) for entry in results.get("questions", [])]
+        return normalized
@@ -0,0 +1,95 @@
+import json
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+from aggregation import aggregate_columnar, count_responses, merge_counters, summarize_counts
+
+PARALLEL_MIN_ROWS = 50000  # Below this, starting worker processes costs more than it saves.
+
+
+def start_context():
+    """
+    Multiprocessing context for the workers. fork is never used: the agent runs threads (token refresh,
+    asyncio.to_thread workers, the service's executor), and a child forked from a threaded process can
+    deadlock on a lock some other thread held at fork time. forkserver forks from a clean single-threaded
+    server that has this module preloaded, so workers start fast; elsewhere workers are spawned.
+    Either way the workers import the caller's main module, which therefore needs an
+    `if __name__ == "__main__":` guard (main.py, service.py and benchmark.py have one).
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["parallel"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _count_shard(shard):
+    """Worker: counts the answers of one shard, stored as JSON at (offset, length) in a shared memory block."""
+    name, offset, length, n_columns = shard
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        rows = json.loads(bytes(block.buf[offset:offset + length]))
+    finally:
+        block.close()
+    return count_responses(rows, n_columns)
+
+
+def shard_bounds(n_rows: int, n_shards: int) -> list:
+    """Splits range(n_rows) into n_shards contiguous (start, stop) pairs of nearly equal size."""
+    size, rest = divmod(n_rows, n_shards)
+    bounds = []
+    start = 0
+    for i in range(n_shards):
+        stop = start + size + (1 if i < rest else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def aggregate_parallel(rows, title, description, workers: int = None,
+                       min_rows: int = PARALLEL_MIN_ROWS) -> dict:
+    """
+    Aggregates like aggregation.aggregate_columnar, but counts contiguous shards of the rows
+    in a process pool (see start_context) and merges the partial counters. Falls back to
+    the serial path for fewer than min_rows responses or a single worker.
+    """
+    workers = workers or os.cpu_count() or 1
+    if not rows or len(rows) - 1 < min_rows or workers < 2:
+        return aggregate_columnar(rows, title, description)
+
+    questions = rows[0][1:]
+    responses = rows[1:]
+    n_columns = len(questions)
+    bounds = shard_bounds(len(responses), workers)
+
+    # The shards are serialized once into a shared memory block; every worker only decodes its own
+    # slice, instead of receiving its rows pickled through a pipe.
+    blobs = [json.dumps(responses[start:stop], separators=(',', ':')).encode("utf-8") for start, stop in bounds]
+    block = shared_memory.SharedMemory(create=True, size=max(sum(len(blob) for blob in blobs), 1))
+    try:
+        shards = []
+        offset = 0
+        for blob in blobs:
+            block.buf[offset:offset + len(blob)] = blob
+            shards.append((block.name, offset, len(blob), n_columns))
+            offset += len(blob)
+        del blobs
+        with start_context().Pool(workers) as pool:
+            parts = pool.map(_count_shard, shards)
+    finally:
+        block.close()
+        block.unlink()
+
+    counters = [{} for _ in questions]
+    for part in parts:
+        merge_counters(counters, part)
+
+    return {
+        "title": title,
+        "description": description,
+        "questions": [
+            summarize_counts(question, list(counter), list(counter.values()))
+            for question, counter in zip(questions, counters)
+        ]
+    }
@@ -0,0 +1,65 @@
+import json
+
+CLOSERS = {"{": "}", "[": "]"}
+
+
+class PartialJSONParser:
+    """
+    Incrementally parses a JSON document that arrives in chunks (e.g. a streamed model output).
+    After every chunk, the longest prefix made of complete values is closed and parsed,
+    so callers see each list element or object member as soon as it is fully received.
+    """
+
+    def __init__(self):
+        self.text = []
+        self.length = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.safe = None  # (prefix length, closing brackets) of the last point where the prefix can be closed
+        self.parsed_safe = None
+
+    def feed(self, chunk: str):
+        """Adds a chunk. Returns the newly parsable snapshot, or None if nothing new was completed."""
+        for offset, char in enumerate(chunk):
+            position = self.length + offset
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in CLOSERS:
+                self.stack.append(CLOSERS[char])
+                self.mark(position + 1)
+            elif char in "}]":
+                if self.stack:
+                    self.stack.pop()
+                self.mark(position + 1)
+            elif char == ",":
+                self.mark(position)
+        self.text.append(chunk)
+        self.length += len(chunk)
+
+        if self.safe is None or self.safe == self.parsed_safe:
+            return None
+        self.parsed_safe = self.safe
+        return self.snapshot()
+
+    def mark(self, position: int):
+        self.safe = (position, "".join(reversed(self.stack)))
+
+    def snapshot(self):
+        """Parses the last closable prefix. Returns None if nothing has been completed yet."""
+        if self.safe is None:
+            return None
+        position, closers = self.safe
+        text = "".join(self.text)
+        self.text = [text]
+        try:
+            return json.loads(text[:position] + closers)
+        except json.JSONDecodeError:
+            return None
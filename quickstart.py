@@ -1,12 +1,9 @@
-import os.path
 import json
-import collections
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from aggregation import aggregate_columnar
+from sheets import CredentialManager, ServicePool
+
 # Wir verwenden hier nur den readonly-Scopes, da wir nur lesen.
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
 
@@ -20,68 +17,17 @@ def aggregate_responses(rows, title, description):
     Annahme: Die erste Zeile enthält Header, 
     wobei die erste Spalte (z.B. Zeitstempel) nicht ausgewertet wird.
     """
-    if not rows or len(rows) < 2:
-        return {"title": title, "description": description, "questions": []}
-    
-    header = rows[0]              # z.B. ["Spalte 1", "Question 1", "Question 2"]
-    responses = rows[1:]          # Jede Zeile entspricht einer Antwort
-
-    # Die Fragen stehen in den Spalten ab Index 1
-    questions = header[1:]
-    analysis_list = []
-
-    # Für jede Frage sammeln wir die Antworten
-    for i, question in enumerate(questions, start=1):
-        counter = collections.Counter()
-        for response in responses:
-            if len(response) > i:
-                answer = response[i]
-                counter[answer] += 1
-
-        total = sum(counter.values())
-        distribution = []
-        for option, count in counter.items():
-            percentage = round((count / total) * 100, 2) if total > 0 else 0
-            distribution.append({
-                "option": option,
-                "count": count,
-                "percentage": percentage
-            })
-        
-        # Bestimme die häufigste Antwort
-        most_common_answer = counter.most_common(1)[0][0] if total > 0 else None
-
-        analysis_list.append({
-            "question": question,
-            "analysis": {
-                "most_common_answer": most_common_answer,
-                "distribution": distribution
-            }
-        })
-
-    return {
-        "title": title,
-        "description": description,
-        "questions": analysis_list
-    }
+    return aggregate_columnar(rows, title, description)
 
 def main():
-    creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
+    # Der CredentialManager hält das Token im Speicher und erneuert es im Hintergrund,
+    # der ServicePool baut die Sheets-Clients aus dem lokal gecachten Discovery-Dokument.
+    pool = ServicePool(CredentialManager(SCOPES).start())
 
     try:
-        service = build("sheets", "v4", credentials=creds)
-        sheet = service.spreadsheets()
-        result = sheet.values().get(spreadsheetId=MY_SPREADSHEET_ID, range=MY_RANGE_NAME).execute()
+        with pool.service() as service:
+            sheet = service.spreadsheets()
+            result = sheet.values().get(spreadsheetId=MY_SPREADSHEET_ID, range=MY_RANGE_NAME).execute()
         rows = result.get("values", [])
 
         if not rows:
@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` tokens per second, bursts of up to `capacity` tokens.
+    Usable from threads (acquire) and from asyncio code (acquire_async).
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.blocked_until = None
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Takes tokens if available and returns 0, otherwise returns the seconds to wait before retrying."""
+        with self.lock:
+            now = self.clock()
+            if self.blocked_until is not None:
+                if now < self.blocked_until:
+                    return self.blocked_until - now
+                self.blocked_until = None
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Hands out no tokens for the next `seconds`, then refills from empty (e.g. after a 429 with Retry-After)."""
+        with self.lock:
+            until = self.clock() + seconds
+            if self.blocked_until is None or until > self.blocked_until:
+                self.blocked_until = until
+                self.tokens = 0.0
+                self.updated = until
+
+    def acquire(self, tokens: float = 1.0):
+        """Blocks until the tokens are available."""
+        while True:
+            wait = self.reserve(tokens)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """Waits (without blocking the event loop) until the tokens are available."""
+        import asyncio  # Imported here so synchronous callers never load asyncio.
+
+        while True:
+            wait = self.reserve(tokens)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
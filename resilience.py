@@ -0,0 +1,340 @@
+import concurrent.futures
+import email.utils
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from ratelimit import TokenBucket
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Requests per second and burst size of every quota the agent draws from.
+QUOTAS = {
+    "gpt-4o-mini": (500 / 60.0, 50),
+    "sheets": (300 / 60.0, 20),  # Sheets API read requests per minute and project
+}
+
+
+class ServiceError(Exception):
+    """An external service (OpenAI, Google Sheets) failed and retrying did not help."""
+
+    def __init__(self, service: str, message: str, status: int = None, attempts: int = 1):
+        super().__init__(message)
+        self.service = service
+        self.status = status
+        self.attempts = attempts
+
+
+class QuotaExceededError(ServiceError):
+    """The service kept answering 429 (or asked to wait longer than the retry policy allows)."""
+
+
+class CircuitOpenError(ServiceError):
+    """The circuit breaker of the service is open; the call was not attempted."""
+
+
+def status_code(exc: Exception):
+    """HTTP status of an OpenAI APIStatusError or a googleapiclient HttpError (None for other errors)."""
+    status = getattr(exc, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(exc: Exception):
+    """Seconds the service asked to wait (Retry-After / retry-after-ms header), or None."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        headers = getattr(exc, "resp", None)  # googleapiclient: an httplib2.Response with lowercase keys
+    if not headers:
+        return None
+    try:
+        milliseconds = headers.get("retry-after-ms")
+        if milliseconds is not None:
+            return float(milliseconds) / 1000.0
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def connection_errors() -> tuple:
+    """Exception types of a failed connection. openai's are only checked if openai was imported (or it can't be raised)."""
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return ConnectionError, TimeoutError
+    return openai.APIConnectionError, ConnectionError, TimeoutError
+
+
+def is_service_error(exc: Exception) -> bool:
+    """Checks whether an exception was raised by the remote service or the connection to it."""
+    return status_code(exc) is not None or isinstance(exc, connection_errors())
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Rate limits, timeouts, connection errors and transient 5xx are worth retrying; other errors are not."""
+    status = status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(exc, connection_errors())
+
+
+def service_error(service: str, exc: Exception, attempts: int) -> ServiceError:
+    status = status_code(exc)
+    cls = QuotaExceededError if status == 429 else ServiceError
+    message = f"{service} request failed after {attempts} attempt{'s' if attempts != 1 else ''}: {exc}"
+    return cls(service, message, status=status, attempts=attempts)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: attempt n waits a random time up to base_delay * 2**n
+    (capped at max_delay). A Retry-After from the service is honoured instead, unless it exceeds
+    max_retry_after, in which case the call fails right away.
+    """
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    max_retry_after: float = 60.0
+
+    def delay(self, attempt: int, requested: float = None, rand=random.random) -> float:
+        if requested is not None:
+            # Spread the waiters a little so they do not all come back in the same instant.
+            return requested + rand() * self.base_delay
+        return rand() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and then fails calls immediately for
+    `reset_timeout` seconds. After that a single trial call is let through (half-open):
+    its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed (0 if calls are allowed now)."""
+        if self.opened_at is None:
+            return 0.0
+        return max(self.reset_timeout - (self.clock() - self.opened_at), 0.0)
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = self.clock()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # Half-open: one trial at a time; a trial that never reports back expires after reset_timeout.
+            if self.trial_at is not None and now - self.trial_at < self.reset_timeout:
+                return False
+            self.trial_at = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self.trial_at = None
+
+
+class Guard:
+    """
+    Runs the calls to one external service through a rate limiter, a circuit breaker and a retry policy.
+    Service errors that survive the retries are raised as ServiceError (QuotaExceededError for 429s)
+    with the original exception as __cause__; other exceptions pass through unchanged.
+
+    With hedge_after set, an attempt that has not finished after that many seconds is sent again
+    in parallel and the first result wins. Only hedge calls that are idempotent and thread-safe
+    (the OpenAI clients are, the pooled Sheets services are not).
+    """
+
+    def __init__(self, service: str, limiter: TokenBucket = None, breaker: CircuitBreaker = None,
+                 policy: RetryPolicy = None, hedge_after: float = None, sleep=time.sleep, rand=random.random):
+        self.service = service
+        self.limiter = limiter
+        self.breaker = breaker
+        self.policy = policy or RetryPolicy()
+        self.hedge_after = hedge_after
+        self.sleep = sleep
+        self.rand = rand
+        self.executor = None
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+
+    def check_breaker(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError(
+                self.service,
+                f"{self.service} is failing, calls are suspended for {self.breaker.retry_in():.0f} more seconds"
+            )
+
+    def failed(self, exc: Exception, attempt: int) -> float:
+        """Books a failed attempt and returns the delay before the next one, or raises the final error."""
+        if not is_retryable(exc):
+            if self.breaker is not None:
+                self.breaker.record_success()  # The service answered; the request itself was refused.
+            raise service_error(self.service, exc, attempt + 1) from exc
+
+        if self.breaker is not None:
+            self.breaker.record_failure()
+        requested = retry_after(exc)
+        if attempt + 1 >= self.policy.max_attempts or (
+                requested is not None and requested > self.policy.max_retry_after):
+            raise service_error(self.service, exc, attempt + 1) from exc
+        if requested is not None and self.limiter is not None:
+            self.limiter.pause(requested)  # Hold back every caller sharing the quota, not just this one.
+        self.retries += 1
+        return self.policy.delay(attempt, requested, self.rand)
+
+    def succeeded(self):
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def may_hedge(self) -> bool:
+        """A hedge is only sent while the service is healthy and the quota has a token to spare."""
+        if self.breaker is not None and self.breaker.state != "closed":
+            return False
+        return self.limiter is None or self.limiter.reserve() == 0.0
+
+    def call(self, fn, *args, **kwargs):
+        """Calls fn(*args, **kwargs) with rate limiting, retries, hedging and circuit breaking."""
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.check_breaker()
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                result = self.attempt(fn, args, kwargs)
+            except Exception as e:
+                if not is_service_error(e):
+                    raise
+                delay = self.failed(e, attempt)
+                attempt += 1
+                self.sleep(delay)
+                continue
+            self.succeeded()
+            return result
+
+    def attempt(self, fn, args, kwargs):
+        if self.hedge_after is None:
+            return fn(*args, **kwargs)
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix=f"{self.service}-hedge")
+        futures = [self.executor.submit(fn, *args, **kwargs)]
+        done, _ = concurrent.futures.wait(futures, timeout=self.hedge_after)
+        if not done and self.may_hedge():
+            self.hedges += 1
+            futures.append(self.executor.submit(fn, *args, **kwargs))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def call_async(self, fn, *args, **kwargs):
+        """Like call, for a coroutine function; waiting never blocks the event loop."""
+        import asyncio  # Imported here so synchronous callers never load asyncio.
+
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.check_breaker()
+            if self.limiter is not None:
+                await self.limiter.acquire_async()
+            try:
+                result = await self.attempt_async(fn, args, kwargs)
+            except Exception as e:
+                if not is_service_error(e):
+                    raise
+                delay = self.failed(e, attempt)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.succeeded()
+            return result
+
+    async def attempt_async(self, fn, args, kwargs):
+        import asyncio
+
+        if self.hedge_after is None:
+            return await fn(*args, **kwargs)
+        tasks = [asyncio.ensure_future(fn(*args, **kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done and self.may_hedge():
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(fn(*args, **kwargs)))
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def quota_limiter(quota: str) -> TokenBucket:
+    """Returns the process-wide token bucket of a quota in QUOTAS, so all agents share one budget."""
+    with _limiters_lock:
+        limiter = _limiters.get(quota)
+        if limiter is None:
+            rate, capacity = QUOTAS[quota]
+            limiter = _limiters[quota] = TokenBucket(rate, capacity)
+        return limiter
+
+
+def default_guard(service: str, quota: str = None, **options) -> Guard:
+    """A Guard with the shared limiter of `quota` (if any), its own circuit breaker and the default retry policy."""
+    limiter = quota_limiter(quota) if quota in QUOTAS else None
+    return Guard(service, limiter=limiter, breaker=CircuitBreaker(), **options)
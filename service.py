@@ -0,0 +1,377 @@
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import os
+import time
+import uuid
+
+from agent import SurveyAgent, SCOPES
+from chat_log import ChatHistoryLog
+from llm_cache import LLMCache
+from metrics import REGISTRY
+from resilience import CircuitOpenError, QuotaExceededError, ServiceError
+
+MAX_BODY = 1 << 20
+
+
+class HTTPError(Exception):
+    """An error response: status code, message and optional extra headers."""
+
+    def __init__(self, status: int, message: str, headers: list = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or []
+
+
+class Session:
+    """One client conversation: its own agent (chat history, editing context) and its current survey."""
+
+    def __init__(self, session_id: str, agent: SurveyAgent):
+        self.id = session_id
+        self.agent = agent
+        self.survey = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SurveyService:
+    """
+    ASGI application exposing SurveyAgent over HTTP (JSON in, JSON out):
+
+        POST /generate   {"topic", "session_id"?}                        -> {"session_id", "survey"}
+        POST /update     {"modifications", "survey"?, "patch"?, "session_id"?} -> {"session_id", "survey"}
+        POST /aggregate  {"spreadsheet_id", "range", "survey_file"?, "refresh"?} -> {"results"}
+        POST /analyze    {"spreadsheet_id", "range", "survey_file"?, "refresh"?} -> {"analysis"}
+        GET  /health, GET /metrics (Prometheus text, recorded only if the service runs with metrics=True)
+
+    The OpenAI client, the LLM cache, the resilience guards, the Sheets pool and the survey stores are
+    created once and shared by all requests; every session gets its own agent on top of them, so chat
+    histories stay separate. Aggregates are kept for `aggregate_ttl` seconds (at most `max_aggregates`
+    of them) and concurrent requests for the same range share one fetch. At most `max_llm_calls` LLM
+    requests run at a time; once `max_waiting` more are queued, further ones are rejected with 503.
+
+    /aggregate and /analyze use the survey definition `survey_file`. If `surveys_dir` is set, a request
+    may name another survey file in that directory instead; names leading out of it are rejected.
+    """
+
+    def __init__(self, openai_client=None, cache=None, llm_guard=None, sheets_guard=None, pool=None,
+                 survey_file: str = "survey.json", sessions_dir: str = "sessions", max_llm_calls: int = 4,
+                 max_waiting: int = 32, aggregate_ttl: float = 60.0, session_ttl: float = 3600.0,
+                 max_sessions: int = 1000, surveys_dir: str = None, max_aggregates: int = 256,
+                 metrics: bool = False):
+        if metrics:
+            REGISTRY.enable()
+        os.makedirs(sessions_dir, exist_ok=True)
+        self.sessions_dir = sessions_dir
+        self.agent = SurveyAgent(
+            openai_client=openai_client,
+            cache=cache if cache is not None else LLMCache(),
+            chat_log=ChatHistoryLog(os.path.join(sessions_dir, "service.jsonl")),
+            survey_file=survey_file,
+            llm_guard=llm_guard,
+            sheets_guard=sheets_guard
+        )
+        if pool is not None:
+            self.agent.pool = pool
+        self.max_llm_calls = max_llm_calls
+        self.max_waiting = max_waiting
+        self.aggregate_ttl = aggregate_ttl
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.surveys_dir = os.path.realpath(surveys_dir) if surveys_dir is not None else None
+        self.max_aggregates = max_aggregates
+
+        self.sessions = {}
+        self.aggregates = {}  # (spreadsheet_id, range, survey version) -> (time, survey, results, associations)
+        self.inflight = {}
+        self.llm_slots = None
+        self.waiting = 0
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_llm_calls + 8,
+                                                              thread_name_prefix="survey-service")
+        self.routes = {
+            ("POST", "/generate"): self.generate,
+            ("POST", "/update"): self.update,
+            ("POST", "/aggregate"): self.aggregate,
+            ("POST", "/analyze"): self.analyze,
+            ("GET", "/health"): self.health,
+        }
+
+    async def run(self, func, *args):
+        """Runs a blocking agent call in the service's thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    @contextlib.asynccontextmanager
+    async def llm_slot(self):
+        """Waits for one of the max_llm_calls LLM slots, or rejects the request if the queue is full."""
+        if self.llm_slots is None:
+            self.llm_slots = asyncio.Semaphore(self.max_llm_calls)
+        if self.llm_slots.locked() and self.waiting >= self.max_waiting:
+            raise HTTPError(503, "Too many LLM requests in flight, try again shortly.", [(b"retry-after", b"1")])
+        self.waiting += 1
+        try:
+            await self.llm_slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self.llm_slots.release()
+
+    def session(self, session_id: str = None) -> Session:
+        """Returns the session with the given id, or starts a new one."""
+        now = time.monotonic()
+        session = self.sessions.get(session_id) if session_id else None
+        if session is None:
+            self.evict_sessions(now)
+            session_id = uuid.uuid4().hex
+            agent = SurveyAgent(
+                openai_client=self.agent.openai_client,
+                cache=self.agent.cache,
+                chat_log=ChatHistoryLog(os.path.join(self.sessions_dir, f"{session_id}.jsonl")),
+                survey_file=self.agent.survey_file,
+                llm_guard=self.agent.llm_guard,
+                sheets_guard=self.agent.sheets_guard
+            )
+            session = self.sessions[session_id] = Session(session_id, agent)
+        session.last_used = now
+        return session
+
+    def evict_sessions(self, now: float):
+        """Closes sessions idle for longer than session_ttl, and the oldest ones beyond max_sessions."""
+        idle = [s for s in self.sessions.values() if now - s.last_used > self.session_ttl]
+        overflow = len(self.sessions) - len(idle) - self.max_sessions + 1
+        if overflow > 0:
+            active = sorted((s for s in self.sessions.values() if s not in idle), key=lambda s: s.last_used)
+            idle += active[:overflow]
+        for session in idle:
+            if not session.lock.locked():
+                session.agent.chat_log.close()
+                del self.sessions[session.id]
+
+    async def generate(self, body: dict) -> dict:
+        topic = require(body, "topic")
+        session = self.session(body.get("session_id"))
+        async with session.lock:
+            session.agent.add_to_chat_history("user", topic)
+            async with self.llm_slot():
+                session.survey = await self.run(session.agent.generate_survey, topic)
+        return {"session_id": session.id, "survey": json.loads(session.survey)}
+
+    async def update(self, body: dict) -> dict:
+        modifications = require(body, "modifications")
+        session = self.session(body.get("session_id"))
+        async with session.lock:
+            survey = body.get("survey")
+            if survey is not None:
+                survey = survey if isinstance(survey, str) else json.dumps(survey)
+            else:
+                survey = session.survey
+            if survey is None:
+                raise HTTPError(400, "No survey to update: pass one or generate it in this session first.")
+            async with self.llm_slot():
+                session.survey = await self.run(
+                    session.agent.update_survey, survey, modifications, bool(body.get("patch", True))
+                )
+        return {"session_id": session.id, "survey": json.loads(session.survey)}
+
+    def survey_file(self, name: str = None) -> str:
+        """Resolves the survey named in a request to a file in surveys_dir (default: the service's survey_file)."""
+        if not name:
+            return self.agent.survey_file
+        if not isinstance(name, str):
+            raise HTTPError(400, "survey_file must be a file name.")
+        if self.surveys_dir is None:
+            raise HTTPError(400, "This service only analyzes its default survey.")
+        path = os.path.realpath(os.path.join(self.surveys_dir, name))
+        if os.path.dirname(path) != self.surveys_dir or not os.path.isfile(path):
+            raise HTTPError(404, f"Unknown survey {name!r}.")
+        return path
+
+    def load_survey(self, survey_file: str, version: bool = False):
+        """
+        Loads a server-side survey definition (its dict, or its version id). Why a file fails to load
+        is only logged: the error could quote the file, which the client should not see.
+        """
+        store = self.agent.survey_store(survey_file)
+        try:
+            return store.current_version() if version else store.load_dict()
+        except (OSError, ValueError) as e:
+            print(f"An error occurred while loading the survey definition {survey_file}: {e}")
+            raise HTTPError(500, "The survey definition could not be loaded.")
+
+    def load_aggregate(self, spreadsheet_id: str, range_def: str, survey_file: str) -> tuple:
+        """Fetches and aggregates a range (blocking); returns survey, results and question associations."""
+        survey = self.load_survey(survey_file)
+        source = self.agent.sheets_source(spreadsheet_id, range_def, SCOPES)
+        if not source.rows():
+            return survey, {}, []
+        results = self.agent.aggregate_responses(source, survey.get("title", ""), survey.get("introduction", ""))
+        return survey, results, self.agent.find_associations(source)
+
+    async def cached_aggregate(self, body: dict) -> tuple:
+        spreadsheet_id = require(body, "spreadsheet_id")
+        range_def = require(body, "range")
+        survey_file = self.survey_file(body.get("survey_file"))
+        version = await self.run(self.load_survey, survey_file, True)
+        key = (spreadsheet_id, range_def, os.path.abspath(survey_file), version)
+
+        cached = self.aggregates.get(key)
+        if cached is not None and not body.get("refresh") and time.monotonic() - cached[0] < self.aggregate_ttl:
+            REGISTRY.inc("service_aggregate_cache_total", result="hit")
+            return cached[1:]
+        REGISTRY.inc("service_aggregate_cache_total", result="miss")
+
+        # Concurrent requests for the same range wait for the one fetch already running.
+        future = self.inflight.get(key)
+        if future is None:
+            future = self.inflight[key] = asyncio.ensure_future(
+                self.run(self.load_aggregate, spreadsheet_id, range_def, survey_file)
+            )
+            try:
+                result = await future
+            finally:
+                del self.inflight[key]
+            self.store_aggregate(key, result)
+            return result
+        return await asyncio.shield(future)
+
+    def store_aggregate(self, key: tuple, result: tuple):
+        """Caches an aggregate, dropping expired entries and, beyond max_aggregates, the oldest ones."""
+        now = time.monotonic()
+        self.aggregates.pop(key, None)
+        for old_key in [k for k, cached in self.aggregates.items() if now - cached[0] >= self.aggregate_ttl]:
+            del self.aggregates[old_key]
+        while len(self.aggregates) >= self.max_aggregates:
+            del self.aggregates[next(iter(self.aggregates))]
+        self.aggregates[key] = (now,) + result
+
+    async def aggregate(self, body: dict) -> dict:
+        _, results, _ = await self.cached_aggregate(body)
+        return {"results": results}
+
+    async def analyze(self, body: dict) -> dict:
+        survey, results, associations = await self.cached_aggregate(body)
+        messages = self.agent.build_analysis_messages(survey, results, associations)
+        async with self.llm_slot():
+            analysis = await self.run(self.agent.complete, messages)
+        return {"analysis": analysis}
+
+    async def health(self, body: dict) -> dict:
+        return {
+            "status": "ok",
+            "sessions": len(self.sessions),
+            "llm_calls_waiting": self.waiting,
+            "cached_aggregates": len(self.aggregates),
+            "llm_cache": self.agent.cache.stats() if self.agent.cache is not None else None,
+        }
+
+    async def handle(self, method: str, path: str, raw: bytes) -> tuple:
+        """Dispatches one request; returns status, content type, body bytes and extra headers."""
+        if method == "GET" and path == "/metrics":
+            return 200, b"text/plain; version=0.0.4", REGISTRY.to_prometheus().encode("utf-8"), []
+        try:
+            handler = self.routes.get((method, path))
+            if handler is None:
+                known = any(route_path == path for _, route_path in self.routes)
+                raise HTTPError(405 if known else 404, "Method not allowed." if known else "Not found.")
+            try:
+                body = json.loads(raw) if raw else {}
+            except ValueError:
+                raise HTTPError(400, "The request body is not valid JSON.")
+            if not isinstance(body, dict):
+                raise HTTPError(400, "The request body must be a JSON object.")
+            status, payload, headers = 200, await handler(body), []
+        except HTTPError as e:
+            status, payload, headers = e.status, {"error": str(e)}, e.headers
+        except QuotaExceededError as e:
+            status, payload, headers = 429, {"error": str(e)}, [(b"retry-after", b"30")]
+        except CircuitOpenError as e:
+            status, payload, headers = 503, {"error": str(e)}, [(b"retry-after", b"30")]
+        except ServiceError as e:
+            status, payload, headers = 502, {"error": str(e)}, []
+        except FileNotFoundError as e:
+            status, payload, headers = 404, {"error": str(e)}, []
+        except ValueError as e:
+            status, payload, headers = 400, {"error": str(e)}, []
+        except Exception as e:
+            print(f"An error occurred while handling {method} {path}: {e}")
+            status, payload, headers = 500, {"error": "Internal server error."}, []
+        return status, b"application/json", json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body and size <= MAX_BODY:  # Stops reading as soon as the body is too large.
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+
+        started = time.perf_counter()
+        if size > MAX_BODY:
+            status, content_type, body, headers = 413, b"application/json", b'{"error":"Request body too large."}', []
+        else:
+            status, content_type, body, headers = await self.handle(scope["method"], scope["path"], b"".join(chunks))
+        REGISTRY.observe("service_request_seconds", time.perf_counter() - started, path=scope["path"])
+        REGISTRY.inc("service_requests_total", path=scope["path"], status=str(status))
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())] + headers,
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def close(self):
+        """Flushes every chat log and stops the worker threads."""
+        for session in self.sessions.values():
+            session.agent.chat_log.close()
+        self.agent.chat_log.close()
+        self.executor.shutdown(wait=False)
+
+
+def require(body: dict, field: str):
+    value = body.get(field)
+    if value is None or value == "":
+        raise HTTPError(400, f"Missing field {field!r}.")
+    return value
+
+
+def create_app() -> SurveyService:
+    """App factory for ASGI servers, e.g. `uvicorn --factory service:create_app`."""
+    return SurveyService(cache=LLMCache("llm_cache.sqlite"), metrics=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the survey agent over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Serving needs an ASGI server: pip install uvicorn (or run any ASGI server "
+                         "with the factory service:create_app).")
+    uvicorn.run(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,230 @@
+import contextlib
+import datetime
+import json
+import os.path
+import queue
+import threading
+
+from metrics import span
+
+# The Google client libraries take a while to import; they are loaded when credentials or services
+# are first needed, so code that only generates surveys never imports them.
+
+DISCOVERY_URL = "https://sheets.googleapis.com/$discovery/rest?version=v4"
+
+
+def default_request():
+    """A google-auth transport request, used to refresh tokens."""
+    from google.auth.transport.requests import Request
+    return Request()
+
+
+class CredentialManager:
+    """
+    Keeps the OAuth credentials in memory and refreshes them in a background thread
+    `refresh_margin` seconds before they expire, so requests never wait for a token refresh.
+    Refreshes are at least `min_refresh_interval` seconds apart, even if one failed or did not
+    move the expiry forward.
+    """
+
+    def __init__(self, scopes, token_file: str = "token.json", secrets_file: str = "credentials.json",
+                 refresh_margin: float = 300.0, creds=None, request_factory=None, min_refresh_interval: float = 60.0):
+        self.scopes = scopes
+        self.token_file = token_file
+        self.secrets_file = secrets_file
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.request_factory = request_factory or default_request
+        self.creds = creds
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def load(self):
+        """Loads the credentials from token.json, refreshing or authorizing them if necessary."""
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        creds = None
+        if os.path.exists(self.token_file):
+            creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(self.request_factory())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(self.secrets_file, self.scopes)
+                creds = flow.run_local_server(port=0)
+            self.save(creds)
+        return creds
+
+    def save(self, creds):
+        with open(self.token_file, "w") as token:
+            token.write(creds.to_json())
+
+    def seconds_left(self) -> float:
+        """Seconds until the current token expires (None if its expiry is unknown)."""
+        expiry = getattr(self.creds, "expiry", None)
+        if expiry is None:
+            return None
+        # google-auth stores the expiry as naive UTC.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds()
+
+    def refresh(self):
+        """Refreshes the token now and persists it."""
+        with self.lock, span("oauth_refresh"):
+            self.creds.refresh(self.request_factory())
+            self.save(self.creds)
+
+    def get(self):
+        """Returns valid credentials, loading them on first use."""
+        with self.lock:
+            if self.creds is None:
+                with span("oauth"):
+                    self.creds = self.load()
+        if not self.creds.valid and self.creds.refresh_token:
+            self.refresh()  # The background refresh did not run (e.g. it is not started).
+        return self.creds
+
+    def start(self):
+        """Starts the background refresh thread."""
+        self.get()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.refresh_loop, name="token-refresh", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def refresh_loop(self):
+        min_wait = 0.0
+        while not self.stopped.is_set():
+            if not getattr(self.creds, "refresh_token", None):
+                return  # Without a refresh token the credentials can only be used until they expire.
+            seconds_left = self.seconds_left()
+            if seconds_left is None:
+                wait = self.min_refresh_interval
+            else:
+                wait = max(seconds_left - self.refresh_margin, min_wait)
+            if self.stopped.wait(wait):
+                return
+            if seconds_left is None:
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"An error occurred during token refresh: {e}")
+            min_wait = self.min_refresh_interval
+
+
+def load_discovery_document(path: str = "sheets_discovery.json") -> dict:
+    """
+    Returns the Sheets v4 discovery document from a local file, so building a service never fetches it.
+    On first use the file is created from the copy bundled with googleapiclient (or downloaded).
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    document = get_static_doc("sheets", "v4")
+    if document is None:
+        import urllib.request
+        with urllib.request.urlopen(DISCOVERY_URL) as response:
+            document = response.read().decode("utf-8")
+    with open(path, "w") as f:
+        f.write(document)
+    return json.loads(document)
+
+
+class ServicePool:
+    """
+    Pool of Sheets service objects sharing one CredentialManager and one parsed discovery document.
+    The discovery-based client and its HTTP connection are not thread-safe, so every service
+    is lent to one thread at a time; services are built lazily up to `size` and then reused.
+    """
+
+    def __init__(self, credentials: CredentialManager, size: int = 4,
+                 discovery_file: str = "sheets_discovery.json", builder=None):
+        self.credentials = credentials
+        self.size = size
+        self.discovery_file = discovery_file
+        self.builder = builder or self.build
+        self.document = None
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def build(self, creds):
+        from googleapiclient.discovery import build_from_document
+
+        with span("discovery_build"):
+            if self.document is None:
+                self.document = load_discovery_document(self.discovery_file)
+            return build_from_document(self.document, credentials=creds)
+
+    def acquire(self):
+        """Takes an idle service, building a new one while the pool is not full."""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return self.builder(self.credentials.get())
+                except Exception:
+                    self.created -= 1
+                    raise
+        return self.idle.get()
+
+    def release(self, service):
+        self.idle.put(service)
+
+    @contextlib.contextmanager
+    def service(self):
+        """Lends a service to the calling thread for the duration of the with block."""
+        service = self.acquire()
+        try:
+            yield service
+        finally:
+            self.release(service)
+
+
+def execute(request, guard=None):
+    """Executes a Sheets API request, through a resilience.Guard (rate limit, retries) if one is given."""
+    if guard is None:
+        return request.execute()
+    return guard.call(request.execute)
+
+
+def group_ranges(requests: list) -> dict:
+    """Groups (spreadsheet_id, range) pairs by spreadsheet, keeping the request order within each group."""
+    groups = {}
+    for spreadsheet_id, range_def in requests:
+        ranges = groups.setdefault(spreadsheet_id, [])
+        if range_def not in ranges:
+            ranges.append(range_def)
+    return groups
+
+
+def batch_get(service, requests: list, guard=None) -> list:
+    """
+    Fetches the rows of many (spreadsheet_id, range) pairs with one values().batchGet call per spreadsheet.
+    Returns the rows of every request in the order of requests.
+    """
+    fetched = {}
+    for spreadsheet_id, ranges in group_ranges(requests).items():
+        result = execute(service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges
+        ), guard)
+        # valueRanges come back in request order, but with normalized range names, so match by position.
+        for range_def, value_range in zip(ranges, result.get("valueRanges", [])):
+            fetched[(spreadsheet_id, range_def)] = value_range.get("values", [])
+    return [fetched.get(request, []) for request in requests]
@@ -0,0 +1,122 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from aggregation import encode_columns
+from metrics import span
+from sheets import execute
+
+
+class ResponseSource:
+    """
+    Where survey responses come from. A source provides the header row (first column: timestamp)
+    and the question columns encoded as (codes, categories), see aggregation.encode_column.
+    Row-based sources only implement rows(); columnar sources override columns() directly.
+    """
+
+    def rows(self) -> list:
+        """Returns the header row followed by one row per response, like the Sheets values() API."""
+        raise NotImplementedError
+
+    def header(self) -> list:
+        rows = self.rows()
+        return rows[0] if rows else []
+
+    def columns(self) -> list:
+        cached = getattr(self, "cached_columns", None)
+        if cached is None:
+            rows = self.rows()
+            cached = encode_columns(rows[1:], len(rows[0]) - 1) if len(rows) >= 2 else []
+            self.cached_columns = cached
+        return cached
+
+
+class SheetsSource(ResponseSource):
+    """Responses of a Google Sheets range, fetched through a sheets.ServicePool (and a resilience.Guard, if given)."""
+
+    def __init__(self, pool, spreadsheet_id: str, range_def: str, guard=None):
+        self.pool = pool
+        self.guard = guard
+        self.spreadsheet_id = spreadsheet_id
+        self.range_def = range_def
+        self.cached_rows = None
+
+    def rows(self) -> list:
+        if self.cached_rows is None:
+            with self.pool.service() as service, span("sheets_fetch"):
+                result = execute(service.spreadsheets().values().get(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=self.range_def
+                ), self.guard)
+            self.cached_rows = result.get("values", [])
+        return self.cached_rows
+
+
+class CSVSource(ResponseSource):
+    """Responses from a CSV export (e.g. "Download responses" in Google Forms)."""
+
+    def __init__(self, path: str, encoding: str = "utf-8-sig", delimiter: str = ","):
+        self.path = path
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.cached_rows = None
+
+    def rows(self) -> list:
+        if self.cached_rows is None:
+            with open(self.path, "r", encoding=self.encoding, newline="") as f:
+                rows = list(csv.reader(f, delimiter=self.delimiter))
+            # The Sheets API omits trailing empty cells; do the same so both sources aggregate alike.
+            for row in rows:
+                while row and row[-1] == "":
+                    row.pop()
+            self.cached_rows = rows
+        return self.cached_rows
+
+
+class ColumnarSource(ResponseSource):
+    """
+    Responses stored column by column in a directory: meta.json (header and categories per question)
+    and one codes_<i>.npy array per question. The arrays are memory-mapped, so counting a
+    million-row export never materializes Python row lists. Create it with write_columnar().
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+
+    def rows(self) -> list:
+        header = self.header()
+        columns = self.columns()
+        n_rows = len(columns[0][0]) if columns else 0
+        rows = [header]
+        for r in range(n_rows):
+            row = [""] + [categories[codes[r]] if codes[r] >= 0 else None for codes, categories in columns]
+            while row and row[-1] is None:
+                row.pop()
+            rows.append(["" if cell is None else cell for cell in row])
+        return rows
+
+    def header(self) -> list:
+        return self.meta["header"]
+
+    def columns(self) -> list:
+        return [
+            (np.load(os.path.join(self.directory, f"codes_{i}.npy"), mmap_mode="r"), categories)
+            for i, categories in enumerate(self.meta["categories"])
+        ]
+
+
+def write_columnar(source: ResponseSource, directory: str):
+    """Exports any source into the directory layout read by ColumnarSource."""
+    os.makedirs(directory, exist_ok=True)
+    columns = source.columns()
+    all_categories = []
+    for i, (codes, categories) in enumerate(columns):
+        dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+        np.save(os.path.join(directory, f"codes_{i}.npy"), np.asarray(codes, dtype=dtype))
+        all_categories.append(list(categories))
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump({"header": source.header(), "categories": all_categories}, f, separators=(',', ':'))
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 class Option(BaseModel):
@@ -10,4 +12,27 @@ class Item(BaseModel):
 class Survey(BaseModel):
   title: str
   introduction: str
-  questions: list[Item]
\ No newline at end of file
+  questions: list[Item]
+
+class SurveyEdit(BaseModel):
+  """
+  One edit operation. Questions and options are addressed by 0-based index.
+  Fields an operation does not use are null.
+  """
+  op: Literal[
+    "set_title",
+    "set_introduction",
+    "add_question",
+    "replace_question",
+    "remove_question",
+    "add_option",
+    "replace_option",
+    "remove_option",
+  ]
+  question: int | None
+  option: int | None
+  text: str | None
+  options: list[Option] | None
+
+class SurveyPatch(BaseModel):
+  edits: list[SurveyEdit]
@@ -0,0 +1,70 @@
+from survey import Survey, SurveyPatch, SurveyEdit, Item, Option
+
+
+class PatchError(ValueError):
+    """Raised when an edit operation does not fit the survey it is applied to."""
+
+
+def check_index(name: str, index, length: int, allow_end: bool = False) -> int:
+    """Validates a 0-based index into a list of the given length."""
+    upper = length if allow_end else length - 1
+    if index is None or not 0 <= index <= upper:
+        raise PatchError(f"{name} index {index} out of range (0..{upper})")
+    return index
+
+
+def require_text(edit: SurveyEdit) -> str:
+    if not edit.text:
+        raise PatchError(f"{edit.op} requires text")
+    return edit.text
+
+
+def apply_edit(survey: Survey, edit: SurveyEdit):
+    """Applies a single edit operation in place."""
+    questions = survey.questions
+
+    if edit.op == "set_title":
+        survey.title = require_text(edit)
+    elif edit.op == "set_introduction":
+        survey.introduction = require_text(edit)
+    elif edit.op == "add_question":
+        index = len(questions) if edit.question is None else check_index("question", edit.question, len(questions), allow_end=True)
+        questions.insert(index, Item(question=require_text(edit), options=list(edit.options or [])))
+    elif edit.op == "replace_question":
+        item = questions[check_index("question", edit.question, len(questions))]
+        if edit.text:
+            item.question = edit.text
+        if edit.options is not None:
+            item.options = list(edit.options)
+    elif edit.op == "remove_question":
+        del questions[check_index("question", edit.question, len(questions))]
+    else:
+        options = questions[check_index("question", edit.question, len(questions))].options
+        if edit.op == "add_option":
+            index = len(options) if edit.option is None else check_index("option", edit.option, len(options), allow_end=True)
+            options.insert(index, Option(option=require_text(edit)))
+        elif edit.op == "replace_option":
+            options[check_index("option", edit.option, len(options))] = Option(option=require_text(edit))
+        elif edit.op == "remove_option":
+            del options[check_index("option", edit.option, len(options))]
+
+
+def apply_patch(survey: Survey, patch: SurveyPatch) -> Survey:
+    """
+    Applies all edits of a patch in order and returns the edited copy of the survey.
+    Indexes refer to the survey as it is after the previous edits. The original survey is left untouched.
+    """
+    edited = survey.model_copy(deep=True)
+    for edit in patch.edits:
+        apply_edit(edited, edit)
+    return edited
+
+
+def numbered_survey(survey: Survey) -> str:
+    """Renders the survey with question and option indexes, so the model can address them in a patch."""
+    lines = [f"title: {survey.title}", f"introduction: {survey.introduction}"]
+    for i, item in enumerate(survey.questions):
+        lines.append(f"question {i}: {item.question}")
+        lines.extend(f"  option {j}: {option.option}" for j, option in enumerate(item.options))
+    return "\n".join(lines)
+
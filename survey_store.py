@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+
+from survey import Survey
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def json_dumps(data: dict) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode("utf-8")
+
+
+def orjson_dumps(data: dict) -> bytes:
+    return orjson.dumps(data)
+
+
+def msgpack_dumps(data: dict) -> bytes:
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def msgpack_loads(raw: bytes) -> dict:
+    return msgpack.unpackb(raw, raw=False)
+
+
+CODECS = {
+    # name: (dumps, loads, available)
+    "json": (json_dumps, json.loads, True),
+    "orjson": (orjson_dumps, orjson.loads if orjson else None, orjson is not None),
+    "msgpack": (msgpack_dumps, msgpack_loads, msgpack is not None),
+}
+
+
+def content_hash(survey: Survey) -> str:
+    """Version id of a survey: hash of its canonical JSON, independent of the storage codec."""
+    return hashlib.sha256(survey.model_dump_json().encode("utf-8")).hexdigest()[:16]
+
+
+def to_survey(survey) -> Survey:
+    """Validates a survey given as Survey, dict, or JSON string/bytes."""
+    if isinstance(survey, Survey):
+        return survey
+    if isinstance(survey, (str, bytes)):
+        return Survey.model_validate_json(survey)
+    return Survey.model_validate(survey)
+
+
+class SurveyStore:
+    """
+    A survey definition file with an in-memory cache of validated versions.
+
+    Every version is validated through the Survey model once and kept under its content hash,
+    so loading an unchanged file (same mtime and size) costs one stat() call, and reloading
+    a version seen before skips validation. Saves are atomic and recorded in an edit history,
+    which makes undo() and redo() a lookup plus one write.
+
+    codec selects the file format: "json" (default, stdlib), "orjson" (same JSON, faster)
+    or "msgpack" (binary, smaller). orjson and msgpack are optional dependencies.
+    """
+
+    def __init__(self, path: str = "survey.json", codec: str = "json", history_limit: int = 100):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown survey codec {codec!r}, expected one of {', '.join(CODECS)}.")
+        dumps, loads, available = CODECS[codec]
+        if not available:
+            raise ValueError(f"The {codec!r} survey codec needs the {codec} package, which is not installed.")
+        self.path = path
+        self.codec = codec
+        self.dumps = dumps
+        self.loads = loads
+        self.history_limit = history_limit
+
+        self.versions = {}  # content hash -> Survey
+        self.dicts = {}  # content hash -> survey dict
+        self.raw_versions = {}  # hash of the file bytes -> content hash
+        self.version = None
+        self.file_stamp = None
+        self.history = []
+        self.position = -1
+        self.lock = threading.RLock()
+
+    def stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def remember(self, survey: Survey) -> str:
+        version = content_hash(survey)
+        if version not in self.versions:
+            self.versions[version] = survey
+            self.dicts[version] = survey.model_dump()
+        return version
+
+    def refresh(self):
+        """Re-reads the file if it changed on disk since it was last loaded or saved."""
+        stamp = self.stamp()
+        if stamp is None:
+            raise FileNotFoundError(f"No survey definition at {self.path}.")
+        if stamp == self.file_stamp:
+            return
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        raw_hash = hashlib.sha256(raw).hexdigest()
+        version = self.raw_versions.get(raw_hash)
+        if version is None:
+            survey = Survey.model_validate_json(raw) if self.codec != "msgpack" else Survey.model_validate(self.loads(raw))
+            version = self.remember(survey)
+            self.raw_versions[raw_hash] = version
+        self.version = version
+        self.file_stamp = stamp
+        if not self.history or self.history[self.position] != version:
+            self.record(version)  # Edited outside the store: becomes the newest history entry.
+
+    def load(self) -> Survey:
+        """Returns the current survey as validated Survey object."""
+        with self.lock:
+            self.refresh()
+            return self.versions[self.version]
+
+    def load_dict(self) -> dict:
+        """
+        Returns the current survey as dict. The dict is shared between callers
+        and must not be modified; use load().model_dump() for a private copy.
+        """
+        with self.lock:
+            self.refresh()
+            return self.dicts[self.version]
+
+    def current_version(self) -> str:
+        with self.lock:
+            self.refresh()
+            return self.version
+
+    def write(self, version: str):
+        raw = self.dumps(self.dicts[version])
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(raw)
+        os.replace(tmp_path, self.path)
+        self.raw_versions[hashlib.sha256(raw).hexdigest()] = version
+        self.version = version
+        self.file_stamp = self.stamp()
+
+    def record(self, version: str):
+        del self.history[self.position + 1:]  # A new edit discards the redo branch.
+        self.history.append(version)
+        if len(self.history) > self.history_limit:
+            del self.history[:len(self.history) - self.history_limit]
+        self.position = len(self.history) - 1
+        self.prune()
+
+    def prune(self):
+        """Forgets the versions that dropped out of the history, so the caches stay as small as the history."""
+        keep = set(self.history)
+        keep.add(self.version)
+        if len(self.versions) <= len(keep) and len(self.raw_versions) <= len(keep):
+            return
+        for version in [version for version in self.versions if version not in keep]:
+            del self.versions[version]
+            del self.dicts[version]
+        self.raw_versions = {raw: version for raw, version in self.raw_versions.items() if version in keep}
+
+    def save(self, survey) -> str:
+        """Validates and saves a survey (Survey, dict or JSON string) and returns its version hash."""
+        survey = to_survey(survey)
+        with self.lock:
+            version = self.remember(survey)
+            if version == self.version and self.stamp() == self.file_stamp:
+                return version
+            self.write(version)
+            if not self.history or self.history[self.position] != version:
+                self.record(version)
+            return version
+
+    def can_undo(self) -> bool:
+        return self.position > 0
+
+    def can_redo(self) -> bool:
+        return self.position < len(self.history) - 1
+
+    def undo(self) -> Survey:
+        """Restores the previous version of the survey (or keeps the current one if there is none)."""
+        with self.lock:
+            self.refresh()
+            if self.can_undo():
+                self.position -= 1
+                self.write(self.history[self.position])
+            return self.versions[self.version]
+
+    def redo(self) -> Survey:
+        """Restores the version that the last undo() went back from."""
+        with self.lock:
+            self.refresh()
+            if self.can_redo():
+                self.position += 1
+                self.write(self.history[self.position])
+            return self.versions[self.version]
@@ -0,0 +1,121 @@
+import contextlib
+import json
+import os
+import re
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SURVEY = {
+    "title": "Beste BMWs aller Zeiten",
+    "introduction": "Ihre Meinung zu den besten BMW-Fahrzeugen.",
+    "questions": [
+        {"question": "Lieblingsmodell?", "options": [{"option": "BMW M3"}, {"option": "BMW X5"}]},
+        {"question": "Bestes Jahrzehnt?", "options": [{"option": "1980er"}, {"option": "2000er"}]}
+    ]
+}
+
+HEADER = ["Zeitstempel", "Lieblingsmodell?", "Bestes Jahrzehnt?"]
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeSheet:
+    """
+    Stands in for a Sheets service and its ServicePool. Serves A1 ranges like "Sheet!A5:C" or "Sheet!A1:C1"
+    from an in-memory sheet (rows[0] is the header row) and records every requested range.
+    """
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.calls = []
+        self.credentials = SimpleNamespace(get=lambda: None)
+
+    @contextlib.contextmanager
+    def service(self):
+        yield self
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def value_range(self, range_def: str) -> dict:
+        cells = range_def.rpartition("!")[2]
+        start, _, end = cells.partition(":")
+        first = int(re.sub(r"\D", "", start) or 1)
+        last = int(re.sub(r"\D", "", end) or len(self.rows))
+        values = [list(row) for row in self.rows[first - 1:last]]
+        return {"range": range_def, "values": values} if values else {"range": range_def}
+
+    def get(self, spreadsheetId, range):
+        self.calls.append(("get", range))
+        return FakeRequest(self.value_range(range))
+
+    def batchGet(self, spreadsheetId, ranges):
+        self.calls.append(("batchGet", tuple(ranges)))
+        return FakeRequest({"valueRanges": [self.value_range(range_def) for range_def in ranges]})
+
+
+class SimulatedClock:
+    """A monotonic clock that only moves when sleep() is called."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        assert seconds >= 0
+        self.now += seconds
+
+
+@pytest.fixture
+def registry():
+    """The metrics registry, enabled for one test and emptied again afterwards."""
+    from metrics import REGISTRY
+
+    REGISTRY.reset()
+    REGISTRY.enable()
+    yield REGISTRY
+    REGISTRY.disable()
+    REGISTRY.reset()
+
+
+@pytest.fixture
+def make_agent(tmp_path):
+    """Builds SurveyAgents wired to a FakeSheet, with guards that neither rate limit nor sleep."""
+    from agent import SurveyAgent
+    from chat_log import ChatHistoryLog
+    from resilience import Guard
+
+    survey_file = tmp_path / "survey.json"
+    survey_file.write_text(json.dumps(SURVEY))
+    agents = []
+
+    def make(rows: list):
+        agent = SurveyAgent(
+            openai_client=object(),
+            chat_log=ChatHistoryLog(str(tmp_path / "chat_history.jsonl")),
+            survey_file=str(survey_file),
+            llm_guard=Guard("fake-openai", sleep=lambda seconds: None),
+            sheets_guard=Guard("fake-sheets", sleep=lambda seconds: None)
+        )
+        agent.pool = FakeSheet(rows)
+        agents.append(agent)
+        return agent
+
+    yield make
+    for agent in agents:
+        agent.chat_log.close()
@@ -0,0 +1,60 @@
+import json
+
+from conftest import SURVEY
+from survey import SurveyPatch
+
+
+def capture(agent, responses: list) -> list:
+    """Replaces agent.complete by a fake returning `responses` in turn; returns the list of sent messages."""
+    sent = []
+
+    def complete(messages, response_format=None):
+        sent.append(messages)
+        return responses[len(sent) - 1]
+
+    agent.complete = complete
+    return sent
+
+
+def test_update_sends_each_instruction_once(make_agent):
+    agent = make_agent([])
+    updated = dict(SURVEY, title="Neuer Titel")
+    sent = capture(agent, [json.dumps(updated), json.dumps(updated)])
+
+    agent.update_survey(json.dumps(SURVEY), "Change the title")
+    agent.update_survey(json.dumps(updated), "Shorten the introduction")
+
+    first, second = sent
+    assert [m["role"] for m in first] == ["system", "user"]
+    assert sum("Change the title" in m["content"] for m in first) == 1
+    assert [m["role"] for m in second] == ["system", "user", "assistant", "user"]
+    assert second[1]["content"] == "Change the title"
+    assert second[2]["content"] == "(survey updated: Neuer Titel)"
+    assert sum("Shorten the introduction" in m["content"] for m in second) == 1
+
+
+def test_failed_update_leaves_no_turns(make_agent):
+    agent = make_agent([])
+
+    def failing_complete(messages, response_format=None):
+        raise ValueError("invalid")
+
+    agent.complete = failing_complete
+    try:
+        agent.update_survey(json.dumps(SURVEY), "Change the title")
+    except ValueError:
+        pass
+    assert list(agent.context.turns) == []
+
+
+def test_patch_fallback_records_the_instruction_once(make_agent):
+    agent = make_agent([])
+    bad_patch = SurveyPatch.model_validate(
+        {"edits": [{"op": "remove_question", "question": 9, "option": None, "text": None, "options": None}]}
+    )
+    sent = capture(agent, [bad_patch.model_dump_json(), json.dumps(SURVEY)])
+
+    agent.update_survey(json.dumps(SURVEY), "Remove question 10", patch=True)
+
+    assert len(sent) == 2
+    assert [role for role, _, _ in agent.context.turns] == ["user", "assistant"]
@@ -0,0 +1,35 @@
+import asyncio
+import json
+import threading
+
+from async_agent import AnalysisSpec, AsyncSurveyAgent
+from conftest import FakeSheet, HEADER, SURVEY
+from resilience import Guard
+
+
+def test_analyze_many_aggregates_off_the_event_loop(tmp_path):
+    survey_file = tmp_path / "survey.json"
+    survey_file.write_text(json.dumps(SURVEY))
+    agent = AsyncSurveyAgent(openai_client=object(), async_client=object(), llm_guard=Guard("fake-openai"),
+                             sheets_guard=Guard("fake-sheets"))
+    agent.pool = FakeSheet([HEADER, ["t1", "BMW M3", "1980er"], ["t2", "BMW X5", "1980er"]])
+
+    threads = []
+    aggregate_responses = agent.aggregate_responses
+
+    def recording_aggregate(*args):
+        threads.append(threading.current_thread())
+        return aggregate_responses(*args)
+
+    async def complete_async(messages, response_format=None):
+        return "analysis"
+
+    agent.aggregate_responses = recording_aggregate
+    agent.complete_async = complete_async
+    specs = [AnalysisSpec("one", "A:C", str(survey_file)), AnalysisSpec("two", "A:C", str(survey_file))]
+    results = asyncio.run(agent.analyze_many(specs))
+
+    assert [result.error for result in results] == [None, None]
+    assert [result.analysis for result in results] == ["analysis", "analysis"]
+    assert results[0].aggregate["title"] == SURVEY["title"]
+    assert threads and threading.main_thread() not in threads
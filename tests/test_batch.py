@@ -0,0 +1,158 @@
+import asyncio
+import io
+import json
+from types import SimpleNamespace
+
+from async_agent import AsyncSurveyAgent
+from batch import dedupe_topics, generate_surveys, generate_surveys_batch
+from conftest import SURVEY
+from resilience import Guard
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeBatchClient:
+    """OpenAI client stand-in for the Batch API; the first `failures` calls to every method fail with 503."""
+
+    def __init__(self, failures: int = 1, polls: int = 2):
+        self.failures = failures
+        self.polls = polls
+        self.calls = []
+        self.uploads = []
+        self.files = SimpleNamespace(create=self.call("files.create"), content=self.call("files.content"))
+        self.created = []
+        self.batches = SimpleNamespace(create=self.call("batches.create"), retrieve=self.call("batches.retrieve"),
+                                       list=self.call("batches.list"))
+
+    def call(self, name):
+        def method(*args, **kwargs):
+            self.calls.append(name)
+            if self.calls.count(name) <= self.failures:
+                raise FakeStatusError(503)
+            return getattr(self, name.replace(".", "_"))(*args, **kwargs)
+        return method
+
+    def files_create(self, file, purpose):
+        self.uploads.append(file[1])
+        return SimpleNamespace(id="file-in")
+
+    def batches_create(self, input_file_id, endpoint, completion_window):
+        batch = SimpleNamespace(id=f"batch-{len(self.created) + 1}", input_file_id=input_file_id)
+        self.created.append(batch)
+        return batch
+
+    def batches_list(self, limit):
+        return SimpleNamespace(data=list(reversed(self.created))[:limit])
+
+    def batches_retrieve(self, batch_id):
+        done = self.calls.count("batches.retrieve") - self.failures > self.polls
+        return SimpleNamespace(id=batch_id, status="completed" if done else "in_progress",
+                               output_file_id="file-out" if done else None, error_file_id=None)
+
+    def files_content(self, file_id):
+        request = json.loads(self.uploads[-1].decode("utf-8").splitlines()[0])
+        line = {"custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": {"choices": [{"message": {"content": json.dumps(SURVEY)}}]}}}
+        return SimpleNamespace(text=json.dumps(line) + "\n")
+
+
+def test_batch_calls_are_retried(make_agent):
+    agent = make_agent([])
+    agent.openai_client = client = FakeBatchClient(failures=1)
+    out = io.StringIO()
+    results = generate_surveys_batch(agent, dedupe_topics(["BMW"]), out, sleep=lambda seconds: None)
+
+    assert results == {"bmw": SURVEY}
+    assert client.calls.count("files.create") == 2
+    assert client.calls.count("batches.create") == 2  # The 503 was answered before a batch was created.
+    assert client.calls.count("batches.list") == 2
+    assert len(client.created) == 1
+    assert client.calls.count("files.content") == 2
+    assert json.loads(out.getvalue())["survey"] == SURVEY
+
+
+def test_batch_can_be_resumed_by_id(make_agent):
+    agent = make_agent([])
+    agent.openai_client = client = FakeBatchClient(failures=0)
+    client.uploads.append(b'{"custom_id":"0"}\n')
+    results = generate_surveys_batch(agent, dedupe_topics(["BMW"]), io.StringIO(), sleep=lambda seconds: None,
+                                     batch_id="batch-1")
+
+    assert results == {"bmw": SURVEY}
+    assert "files.create" not in client.calls and "batches.create" not in client.calls
+
+
+class LostResponseClient(FakeBatchClient):
+    """The first batches.create is carried out by the service, but its response never arrives."""
+
+    def batches_create(self, input_file_id, endpoint, completion_window):
+        batch = super().batches_create(input_file_id, endpoint, completion_window)
+        if len(self.created) == 1:
+            raise TimeoutError("read timed out")
+        return batch
+
+
+def test_batch_is_not_created_twice_when_the_response_is_lost(make_agent):
+    agent = make_agent([])
+    agent.openai_client = client = LostResponseClient(failures=0)
+    results = generate_surveys_batch(agent, dedupe_topics(["BMW"]), io.StringIO(), sleep=lambda seconds: None)
+
+    assert results == {"bmw": SURVEY}
+    assert client.calls.count("batches.create") == 1
+    assert client.calls.count("batches.list") == 1
+    assert [batch.id for batch in client.created] == ["batch-1"]
+
+
+class StubAsyncClient:
+    """AsyncOpenAI stand-in: answers every survey request after a short delay, tracking the requests in flight."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.topics = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(parse=self.parse)))
+
+    async def parse(self, messages, **kwargs):
+        topic = messages[-1]["content"]
+        self.topics.append(topic)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if topic in self.failing:
+                raise ValueError(f"no survey for {topic}")
+            content = json.dumps(dict(SURVEY, title=topic))
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+        finally:
+            self.in_flight -= 1
+
+
+def test_concurrent_generation_dedupes_topics_and_keeps_going_after_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = StubAsyncClient(failing={"Mercedes"})
+    agent = AsyncSurveyAgent(openai_client=object(), async_client=client, llm_guard=Guard("fake-openai"),
+                             sheets_guard=Guard("fake-sheets"))
+    topics = ["BMW", "bmw!", " BMW ", "Audi", "Mercedes", "Porsche", "VW", "Opel"]
+    try:
+        results = generate_surveys(agent, topics, output_file="surveys.jsonl", concurrency=2,
+                                   requests_per_minute=60000)
+    finally:
+        agent.chat_log.close()
+
+    assert sorted(client.topics) == ["Audi", "BMW", "Mercedes", "Opel", "Porsche", "VW"]
+    assert client.max_in_flight == 2
+    assert set(results) == set(topics)
+    assert results["BMW"]["title"] == results["bmw!"]["title"] == results[" BMW "]["title"] == "BMW"
+    assert results["Opel"]["title"] == "Opel"
+    assert results["Mercedes"] is None
+
+    with open(tmp_path / "surveys.jsonl", "r", encoding="utf-8") as f:
+        lines = {line["topic"]: line for line in map(json.loads, f)}
+    assert sorted(lines) == ["Audi", "BMW", "Mercedes", "Opel", "Porsche", "VW"]
+    assert lines["Mercedes"]["survey"] is None and "no survey for Mercedes" in lines["Mercedes"]["error"]
+    assert lines["VW"]["survey"]["title"] == "VW" and "error" not in lines["VW"]
@@ -0,0 +1,43 @@
+import gc
+import weakref
+
+from chat_log import ChatHistoryLog
+
+
+def test_messages_round_trip_and_torn_line_is_cut(tmp_path):
+    path = tmp_path / "chat.jsonl"
+    log = ChatHistoryLog(str(path), flush_every=2, fsync=False)
+    for i in range(3):
+        log.append({"role": "user", "content": f"m{i}"})
+    assert [message["content"] for message in log] == ["m0", "m1", "m2"]
+    log.close()
+
+    with open(path, "a") as f:
+        f.write('{"role":"user","con')
+    log = ChatHistoryLog(str(path), fsync=False)
+    log.append({"role": "assistant", "content": "m3"})
+    log.close()
+    assert [message["content"] for message in ChatHistoryLog(str(path))] == ["m0", "m1", "m2", "m3"]
+
+
+def test_closed_logs_are_garbage_collected(tmp_path):
+    log = ChatHistoryLog(str(tmp_path / "chat.jsonl"), fsync=False)
+    log.append({"role": "user", "content": "hello"})
+    log.close()
+    ref = weakref.ref(log)
+    del log
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_appending_after_close_registers_the_exit_flush_again(tmp_path):
+    log = ChatHistoryLog(str(tmp_path / "chat.jsonl"), fsync=False)
+    log.append({"role": "user", "content": "one"})
+    log.close()
+    log.append({"role": "user", "content": "two"})
+
+    assert log.at_exit
+    log.close()
+    assert not log.at_exit
+    assert [message["content"] for message in log] == ["one", "two"]
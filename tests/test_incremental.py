@@ -0,0 +1,100 @@
+from conftest import HEADER
+from incremental import IncrementalAggregator, make_range, split_range
+
+RANGE = "Formularantworten 1!A:C"
+
+
+def counters(aggregator: IncrementalAggregator) -> list:
+    return [dict(counter) for counter in aggregator.counters]
+
+
+def test_ranges():
+    assert split_range(RANGE) == ("Formularantworten 1", "A", "C")
+    assert make_range(RANGE, 5) == "Formularantworten 1!A5:C"
+    assert make_range(RANGE, 1, 1) == "Formularantworten 1!A1:C1"
+    assert make_range("A:F", 2) == "A2:F"
+
+
+def test_cursor_advances_and_only_new_rows_are_fetched(make_agent, tmp_path):
+    agent = make_agent([HEADER, ["t1", "BMW M3", "1980er"], ["t2", "BMW X5", "1980er"]])
+    aggregator = IncrementalAggregator(str(tmp_path / "state.json"))
+
+    assert agent.update_aggregator(aggregator, [], "sheet", RANGE) == 2
+    assert aggregator.last_row == 3
+    assert counters(aggregator) == [{"BMW M3": 1, "BMW X5": 1}, {"1980er": 2}]
+
+    agent.pool.rows.append(["t3", "BMW M3", "2000er"])
+    assert agent.update_aggregator(aggregator, [], "sheet", RANGE) == 1
+    assert aggregator.last_row == 4
+    assert counters(aggregator) == [{"BMW M3": 2, "BMW X5": 1}, {"1980er": 2, "2000er": 1}]
+    assert agent.pool.calls[-1] == ("batchGet", (
+        "Formularantworten 1!A1:C1", "Formularantworten 1!A3:C3", "Formularantworten 1!A4:C"
+    ))
+
+    assert agent.update_aggregator(aggregator, [], "sheet", RANGE) == 0
+    assert [call[0] for call in agent.pool.calls] == ["batchGet"] * 3  # No full re-fetch.
+
+
+def test_state_survives_a_restart(make_agent, tmp_path):
+    agent = make_agent([HEADER, ["t1", "BMW M3", "1980er"]])
+    aggregator = IncrementalAggregator(str(tmp_path / "state.json"))
+    agent.update_aggregator(aggregator, [], "sheet", RANGE)
+    aggregator.save()
+
+    restored = IncrementalAggregator(str(tmp_path / "state.json"))
+    agent.pool.rows.append(["t2", "BMW X5", "1980er"])
+    assert agent.update_aggregator(restored, [], "sheet", RANGE) == 1
+    assert counters(restored) == [{"BMW M3": 1, "BMW X5": 1}, {"1980er": 2}]
+
+
+def test_header_change_rebuilds(make_agent, tmp_path):
+    agent = make_agent([HEADER, ["t1", "BMW M3", "1980er"], ["t2", "BMW X5", "1980er"]])
+    aggregator = IncrementalAggregator(str(tmp_path / "state.json"))
+    agent.update_aggregator(aggregator, [], "sheet", RANGE)
+
+    agent.pool.rows[0] = ["Zeitstempel", "Modell?", "Jahrzehnt?"]
+    assert agent.update_aggregator(aggregator, [], "sheet", RANGE) == 2
+    assert aggregator.header == ["Zeitstempel", "Modell?", "Jahrzehnt?"]
+    assert counters(aggregator) == [{"BMW M3": 1, "BMW X5": 1}, {"1980er": 2}]
+    assert agent.pool.calls[-1][0] == "get"
+
+
+def test_edited_last_row_rebuilds(make_agent, tmp_path):
+    agent = make_agent([HEADER, ["t1", "BMW M3", "1980er"], ["t2", "BMW X5", "1980er"]])
+    aggregator = IncrementalAggregator(str(tmp_path / "state.json"))
+    agent.update_aggregator(aggregator, [], "sheet", RANGE)
+
+    agent.pool.rows[2] = ["t2", "BMW i4", "2010er"]
+    agent.pool.rows.append(["t3", "BMW M3", "1980er"])
+    assert agent.update_aggregator(aggregator, [], "sheet", RANGE) == 3
+    assert counters(aggregator) == [{"BMW M3": 2, "BMW i4": 1}, {"1980er": 2, "2010er": 1}]
+    assert aggregator.last_row == 4
+
+
+def test_deleted_rows_rebuild(make_agent, tmp_path):
+    agent = make_agent([HEADER, ["t1", "BMW M3", "1980er"], ["t2", "BMW X5", "1980er"]])
+    aggregator = IncrementalAggregator(str(tmp_path / "state.json"))
+    agent.update_aggregator(aggregator, [], "sheet", RANGE)
+
+    del agent.pool.rows[1]
+    assert agent.update_aggregator(aggregator, [], "sheet", RANGE) == 1
+    assert counters(aggregator) == [{"BMW X5": 1}, {"1980er": 1}]
+
+
+def test_other_sheet_rebuilds(make_agent, tmp_path):
+    agent = make_agent([HEADER, ["t1", "BMW M3", "1980er"]])
+    aggregator = IncrementalAggregator(str(tmp_path / "state.json"))
+    agent.update_aggregator(aggregator, [], "sheet", RANGE)
+
+    assert aggregator.needs_rebuild("other-sheet", RANGE, HEADER)
+    assert agent.update_aggregator(aggregator, [], "other-sheet", RANGE) == 1
+    assert aggregator.spreadsheet_id == "other-sheet"
+    assert counters(aggregator) == [{"BMW M3": 1}, {"1980er": 1}]
+
+
+def test_empty_sheet(make_agent, tmp_path):
+    agent = make_agent([])
+    aggregator = IncrementalAggregator(str(tmp_path / "state.json"))
+
+    assert agent.update_aggregator(aggregator, [], "sheet", RANGE) is None
+    assert aggregator.result("T", "D") == {"title": "T", "description": "D", "questions": []}
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+from conftest import SimulatedClock
+from llm_cache import LLMCache
+from survey import Survey, SurveyPatch
+
+MESSAGES = [{"role": "user", "content": "Create a survey on BMW"}]
+
+
+class StubCompletions:
+    """chat.completions / beta.chat.completions stand-in that counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def respond(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {self.calls}"))],
+                               usage=None)
+
+    create = parse = respond
+
+
+def stub_client():
+    completions = StubCompletions()
+    chat = SimpleNamespace(completions=completions)
+    return SimpleNamespace(chat=chat, beta=SimpleNamespace(chat=chat)), completions
+
+
+def test_repeated_completion_is_served_from_the_cache(make_agent):
+    agent = make_agent([])
+    agent.openai_client, completions = stub_client()
+    agent.cache = LLMCache()
+
+    assert agent.complete(MESSAGES) == "answer 1"
+    assert agent.complete(MESSAGES) == "answer 1"
+    assert agent.complete(MESSAGES, response_format=Survey) == "answer 2"
+    assert agent.complete(MESSAGES, response_format=Survey) == "answer 2"
+    assert completions.calls == 2
+
+
+def test_key_depends_on_model_messages_and_schema():
+    key = LLMCache.make_key("gpt-4o-mini", MESSAGES, Survey)
+
+    assert LLMCache.make_key("gpt-4o-mini", [dict(MESSAGES[0])], Survey) == key
+    assert LLMCache.make_key("gpt-4o", MESSAGES, Survey) != key
+    assert LLMCache.make_key("gpt-4o-mini", [{"role": "user", "content": "Create a survey on Audi"}], Survey) != key
+    assert LLMCache.make_key("gpt-4o-mini", MESSAGES, SurveyPatch) != key
+    assert LLMCache.make_key("gpt-4o-mini", MESSAGES) != key
+
+
+def test_memory_tier_evicts_the_least_recently_used_entry():
+    cache = LLMCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert list(cache.memory) == ["a", "c"]
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_disk_tier_is_capped(tmp_path):
+    clock = SimulatedClock()
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_entries=1, max_disk_entries=2, clock=clock)
+    for key in "abc":
+        cache.set(key, key.upper())
+        clock.sleep(1)
+
+    assert cache.stats()["disk_entries"] == 2
+    assert cache.get("a") is None
+    assert cache.get("b") == "B"
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    clock = SimulatedClock()
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), ttl=60, clock=clock)
+    cache.set("a", "1")
+
+    clock.sleep(60)
+    assert cache.get("a") == "1"
+    clock.sleep(1)
+    assert cache.get("a") is None
+    assert cache.stats()["memory_entries"] == 0
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    LLMCache(path).set("a", "1")
+
+    cache = LLMCache(path)
+    assert cache.get("a") == "1"
+    assert cache.stats()["memory_entries"] == 1  # Promoted into the memory tier.
+
+
+def test_stats_count_hits_and_misses(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    cache.get("a")
+    cache.set("a", "1")
+    cache.get("a")
+    cache.get("a")
+
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 0.6667, "memory_entries": 1, "disk_entries": 1}
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "hit_rate": 0.0, "memory_entries": 0, "disk_entries": 0}
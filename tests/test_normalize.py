@@ -0,0 +1,110 @@
+import json
+import os
+
+import pytest
+
+from normalize import OTHER, OptionIndex, SurveyNormalizer, close_match
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(REPO, "survey.json"), "r") as f:
+    SURVEY = json.load(f)
+
+MODELS = [option["option"] for option in SURVEY["questions"][0]["options"]]  # BMW M3, BMW 3er, BMW X5, BMW i4
+DECADES = [option["option"] for option in SURVEY["questions"][1]["options"]]
+VALUES = [option["option"] for option in SURVEY["questions"][4]["options"]]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("BMW M3", ["BMW M3"]),
+    ("  bmw   m3 ", ["BMW M3"]),
+    ("BMW X5", ["BMW X5"]),
+])
+def test_exact_matches_ignore_case_and_whitespace(raw, expected):
+    assert OptionIndex(MODELS).match(raw) == expected
+
+
+def test_multi_select_is_split_and_deduplicated():
+    index = OptionIndex(MODELS)
+    assert index.match("BMW M3, bmw x5") == ["BMW M3", "BMW X5"]
+    assert index.match("BMW M3,BMW M3") == ["BMW M3"]
+    assert index.match("BMW M3, Tesla") == []  # One unknown part: the whole answer is "Other".
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Desgin", "Design"),
+    ("Fahrdynamk", "Fahrdynamik"),
+    ("Technolgie", "Technologie"),
+])
+def test_typos_are_matched(raw, expected):
+    assert OptionIndex(VALUES).match(raw) == [expected]
+
+
+@pytest.mark.parametrize("options, raw", [
+    (MODELS, "BMW M4"),
+    (MODELS, "BMW M5"),
+    (MODELS, "BMW X3"),
+    (MODELS, "BMW i8"),
+    (DECADES, "1990er"),
+    (DECADES, "1970er"),
+    (MODELS, "Tesla"),
+])
+def test_near_misses_go_to_other(options, raw):
+    assert OptionIndex(options).match(raw) == []
+
+
+def test_ambiguous_typo_goes_to_other():
+    assert close_match("colour", ["color", "colours"]) is None
+    assert close_match("colour", ["color", "shape"]) == "color"
+
+
+def test_answers_are_memoized():
+    index = OptionIndex(VALUES)
+    calls = []
+    resolve = index.resolve
+    index.resolve = lambda raw: calls.append(raw) or resolve(raw)
+
+    assert index.match("Desgin") == index.match("Desgin") == ["Design"]
+    assert index.match("Tesla") == index.match("Tesla") == []
+    assert calls == ["Desgin", "Tesla"]
+
+
+def results(question: str, distribution: dict) -> dict:
+    return {"title": SURVEY["title"], "description": "", "questions": [{
+        "question": question,
+        "analysis": {"distribution": [{"option": option, "count": count} for option, count in distribution.items()]}
+    }]}
+
+
+def test_normalizer_buckets_answers_and_collects_other():
+    normalizer = SurveyNormalizer(SURVEY)
+    question = SURVEY["questions"][0]["question"]
+    normalized = normalizer.normalize(results(question, {"BMW M3": 3, "bmw m3": 1, "BMW M4": 2, "BMW M3, BMW X5": 1, "": 4}))
+
+    analysis = normalized["questions"][0]["analysis"]
+    counts = {bucket["option"]: bucket["count"] for bucket in analysis["distribution"]}
+    assert counts == {"BMW M3": 5, "BMW X5": 1, OTHER: 2}
+    assert analysis["other_answers"] == {"BMW M4": 2}
+
+
+def test_headers_match_questions_only_when_close():
+    normalizer = SurveyNormalizer(SURVEY)
+    question = SURVEY["questions"][0]["question"]
+
+    assert normalizer.index_for(question.upper()) is normalizer.indexes[question.casefold()]
+    assert normalizer.index_for("Was ist Ihr Lieblings-BMW-Modell ?") is normalizer.indexes[question.casefold()]
+    assert normalizer.index_for("Wie alt sind Sie?") is None
+    entry = results("Wie alt sind Sie?", {"42": 1})["questions"][0]
+    assert normalizer.normalize_question(entry) is entry
+
+
+def test_headers_with_other_numbers_are_not_matched():
+    survey = {"questions": [
+        {"question": "Bewertung Modell 1", "options": [{"option": "gut"}]},
+        {"question": "Bewertung Modell 2", "options": [{"option": "gut"}]},
+    ]}
+    normalizer = SurveyNormalizer(survey)
+
+    assert normalizer.index_for("Bewertung  modell 2") is normalizer.indexes["bewertung modell 2"]
+    assert normalizer.index_for("Bewertung Modell 3") is None
+    assert normalizer.index_for("Bewertung Modell 12") is None
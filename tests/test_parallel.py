@@ -0,0 +1,40 @@
+import threading
+
+from aggregation import aggregate_columnar
+from parallel import aggregate_parallel, shard_bounds
+
+
+def make_rows(n: int) -> list:
+    rows = [["Zeitstempel", "Modell", "Jahrzehnt", "Kommentar"]]
+    for i in range(n):
+        rows.append([f"t{i}", ["BMW M3", "BMW X5", "BMW i4"][i % 3], ["1980er", "2000er"][i % 7 % 2], f"c{i % 11}"][:2 + i % 3])
+    return rows
+
+
+def test_shard_bounds_cover_all_rows():
+    assert shard_bounds(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert shard_bounds(2, 4) == [(0, 1), (1, 2), (2, 2), (2, 2)]
+
+
+def test_parallel_matches_serial_while_other_threads_hold_locks():
+    rows = make_rows(3000)
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def hold():
+        while not stop.is_set():
+            with lock:
+                stop.wait(0.001)
+
+    thread = threading.Thread(target=hold, daemon=True)
+    thread.start()
+    try:
+        assert aggregate_parallel(rows, "T", "D", workers=3, min_rows=0) == aggregate_columnar(rows, "T", "D")
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_small_inputs_stay_serial():
+    rows = make_rows(10)
+    assert aggregate_parallel(rows, "T", "D", workers=4) == aggregate_columnar(rows, "T", "D")
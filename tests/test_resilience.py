@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import SimulatedClock
+from ratelimit import TokenBucket
+from resilience import (CircuitBreaker, CircuitOpenError, Guard, QuotaExceededError, RetryPolicy, ServiceError,
+                        retry_after)
+
+
+class FakeAPIError(Exception):
+    """Looks like an OpenAI APIStatusError: status_code and response headers."""
+
+    def __init__(self, status_code: int, headers: dict = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class FaultyService:
+    """Fails with the queued errors first, then answers "ok"; records the clock time of every call."""
+
+    def __init__(self, errors: list, clock=time.monotonic):
+        self.errors = list(errors)
+        self.clock = clock
+        self.calls = []
+
+    def __call__(self):
+        self.calls.append(self.clock())
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def clock():
+    return SimulatedClock()
+
+
+def guard(clock, **options) -> Guard:
+    options.setdefault("policy", RetryPolicy(max_attempts=4, base_delay=1.0))
+    return Guard("fake", sleep=clock.sleep, rand=lambda: 0.0, **options)
+
+
+def test_retry_after_headers():
+    assert retry_after(FakeAPIError(429, {"retry-after": "3"})) == 3.0
+    assert retry_after(FakeAPIError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after(FakeAPIError(429)) is None
+
+
+def test_transient_errors_are_retried(clock):
+    service = FaultyService([FakeAPIError(503), ConnectionError("reset")], clock)
+    g = guard(clock)
+
+    assert g.call(service) == "ok"
+    assert len(service.calls) == 3
+    assert g.retries == 2
+
+
+def test_429_retry_after_pauses_the_shared_bucket(clock):
+    bucket = TokenBucket(rate=1000.0, capacity=10, clock=clock)
+    service = FaultyService([FakeAPIError(429, {"retry-after": "5"})], clock)
+    first = guard(clock, limiter=bucket)
+    first.rand = lambda: 0.5  # Waits 5.5 s, so the bucket has refilled when the retry acquires a token.
+    second = guard(clock, limiter=bucket)
+    paused_for = []
+    first.sleep = lambda seconds: (paused_for.append(bucket.reserve()), clock.sleep(seconds))
+
+    assert first.call(service) == "ok"
+    assert paused_for == [pytest.approx(5.0)]  # Every caller sharing the bucket was held back.
+    assert service.calls[1] - service.calls[0] >= 5.0
+    assert second.call(FaultyService([], clock)) == "ok"
+
+
+def test_retries_exhausted_raise_service_error(clock):
+    service = FaultyService([FakeAPIError(503)] * 10, clock)
+
+    with pytest.raises(ServiceError) as info:
+        guard(clock).call(service)
+    assert not isinstance(info.value, QuotaExceededError)
+    assert info.value.status == 503
+    assert info.value.attempts == 4
+    assert isinstance(info.value.__cause__, FakeAPIError)
+    assert len(service.calls) == 4
+
+
+def test_rate_limited_until_exhausted_raises_quota_exceeded(clock):
+    service = FaultyService([FakeAPIError(429)] * 10, clock)
+
+    with pytest.raises(QuotaExceededError) as info:
+        guard(clock).call(service)
+    assert info.value.attempts == 4
+
+
+def test_too_long_retry_after_fails_at_once(clock):
+    service = FaultyService([FakeAPIError(429, {"retry-after": "3600"})], clock)
+
+    with pytest.raises(QuotaExceededError):
+        guard(clock).call(service)
+    assert len(service.calls) == 1
+
+
+def test_client_errors_are_not_retried_and_other_errors_pass_through(clock):
+    with pytest.raises(ServiceError) as info:
+        guard(clock).call(FaultyService([FakeAPIError(400)], clock))
+    assert info.value.attempts == 1
+
+    with pytest.raises(KeyError):
+        guard(clock).call(FaultyService([KeyError("bug")], clock))
+
+
+def test_breaker_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0, clock=clock)
+    g = guard(clock, breaker=breaker, policy=RetryPolicy(max_attempts=1))
+    failing = FaultyService([FakeAPIError(500)] * 10, clock)
+
+    for _ in range(2):
+        with pytest.raises(ServiceError):
+            g.call(failing)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        g.call(failing)
+    assert len(failing.calls) == 2  # Not attempted while open.
+
+    clock.sleep(30.0)
+    assert breaker.state == "half_open"
+    with pytest.raises(ServiceError):
+        g.call(failing)  # The trial call fails: open again.
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        g.call(failing)
+
+    clock.sleep(30.0)
+    assert g.call(FaultyService([], clock)) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.sleep(10.0)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    clock.sleep(10.0)
+    assert breaker.allow()  # A trial that never reported back expires.
+
+
+def test_hedged_call_returns_the_faster_attempt():
+    release = threading.Event()
+    calls = []
+
+    def service():
+        calls.append(None)
+        if len(calls) == 1:
+            release.wait(5.0)
+            return "slow"
+        return "fast"
+
+    g = Guard("fake", hedge_after=0.05)
+    try:
+        assert g.call(service) == "fast"
+        assert g.hedges == 1
+    finally:
+        release.set()
+
+
+def test_no_hedge_while_the_breaker_is_not_closed(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0, clock=clock)
+    breaker.record_failure()
+    g = Guard("fake", breaker=breaker, hedge_after=0.01)
+
+    assert not g.may_hedge()
+
+
+def test_async_retries_and_hedging():
+    attempts = []
+
+    async def flaky():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise FakeAPIError(502)
+        if len(attempts) == 2:
+            await asyncio.sleep(5.0)
+            return "slow"
+        return "fast"
+
+    g = Guard("fake", policy=RetryPolicy(base_delay=0.001), hedge_after=0.05)
+    assert asyncio.run(g.call_async(flaky)) == "fast"
+    assert g.retries == 1
+    assert g.hedges == 1
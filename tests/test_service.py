@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import FakeSheet, HEADER, SURVEY
+from resilience import Guard
+from metrics import REGISTRY
+from service import MAX_BODY, SurveyService, create_app
+
+ROWS = [HEADER] + [[f"t{i}", "BMW M3" if i % 3 else "BMW X5", "1980er"] for i in range(12)]
+
+
+@pytest.fixture
+def make_service(tmp_path):
+    services = []
+
+    def make(**options):
+        survey_file = tmp_path / "survey.json"
+        survey_file.write_text(json.dumps(SURVEY))
+        service = SurveyService(
+            openai_client=object(), llm_guard=Guard("fake-openai"), sheets_guard=Guard("fake-sheets"),
+            pool=FakeSheet(ROWS), survey_file=str(survey_file), sessions_dir=str(tmp_path / "sessions"), **options
+        )
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.close()
+    REGISTRY.disable()
+    REGISTRY.reset()
+
+
+async def send_request(app, method: str, path: str, chunks: list) -> tuple:
+    """Sends a request body in chunks; returns status, JSON body and the number of receive() calls."""
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    sent = []
+    calls = 0
+
+    async def receive():
+        nonlocal calls
+        calls += 1
+        if calls > len(chunks):
+            return {"type": "http.disconnect"}
+        return {"type": "http.request", "body": chunks[calls - 1], "more_body": calls < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"], json.loads(b"".join(message.get("body", b"") for message in sent[1:])), calls
+
+
+def post(app, path: str, body: dict) -> tuple:
+    status, payload, _ = asyncio.run(send_request(app, "POST", path, [json.dumps(body).encode("utf-8")]))
+    return status, payload
+
+
+def test_aggregate_uses_the_default_survey(make_service):
+    status, payload = post(make_service(), "/aggregate", {"spreadsheet_id": "sheet", "range": "A:C"})
+
+    assert status == 200
+    assert payload["results"]["title"] == SURVEY["title"]
+
+
+@pytest.mark.parametrize("surveys_dir", [False, True])
+@pytest.mark.parametrize("name", ["/etc/passwd", "../../etc/passwd", "missing.json", "sub/../../survey.json"])
+def test_survey_file_cannot_leave_the_surveys_dir(make_service, tmp_path, surveys_dir, name):
+    service = make_service(surveys_dir=str(tmp_path) if surveys_dir else None)
+    status, payload = post(service, "/aggregate", {"spreadsheet_id": "sheet", "range": "A:C", "survey_file": name})
+
+    assert status in (400, 404)
+    assert "root:" not in payload["error"]
+    assert len(service.agent.stores) <= 1
+
+
+def test_named_survey_in_the_surveys_dir(make_service, tmp_path):
+    (tmp_path / "other.json").write_text(json.dumps(dict(SURVEY, title="Andere Umfrage")))
+    service = make_service(surveys_dir=str(tmp_path))
+    status, payload = post(service, "/aggregate", {"spreadsheet_id": "sheet", "range": "A:C", "survey_file": "other.json"})
+
+    assert status == 200
+    assert payload["results"]["title"] == "Andere Umfrage"
+
+
+def test_invalid_survey_file_is_not_echoed(make_service, tmp_path):
+    (tmp_path / "secret.json").write_text('{"token": "s3cr3t"}')
+    service = make_service(surveys_dir=str(tmp_path))
+    status, payload = post(service, "/analyze", {"spreadsheet_id": "sheet", "range": "A:C", "survey_file": "secret.json"})
+
+    assert status == 500
+    assert "s3cr3t" not in json.dumps(payload)
+
+
+def test_large_body_is_rejected_without_reading_it(make_service):
+    chunk = b" " * (MAX_BODY // 4)
+    status, payload, calls = asyncio.run(send_request(make_service(), "POST", "/generate", [chunk] * 100))
+
+    assert status == 413
+    assert calls == 5
+
+
+def test_aggregate_cache_is_bounded(make_service):
+    service = make_service(max_aggregates=2)
+    for column in "ABCD":
+        assert post(service, "/aggregate", {"spreadsheet_id": "sheet", "range": f"{column}:C"})[0] == 200
+
+    assert len(service.aggregates) == 2
+    assert [key[1] for key in service.aggregates] == ["C:C", "D:C"]
+
+
+def test_expired_aggregates_are_purged(make_service):
+    service = make_service(aggregate_ttl=0.0)
+    for column in "ABC":
+        post(service, "/aggregate", {"spreadsheet_id": "sheet", "range": f"{column}:C"})
+
+    assert len(service.aggregates) == 1
+
+
+async def get_text(app, path: str) -> tuple:
+    scope = {"type": "http", "method": "GET", "path": path, "headers": []}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:]).decode("utf-8")
+
+
+def test_metrics_are_recorded_when_enabled(make_service):
+    service = make_service(metrics=True)
+    post(service, "/aggregate", {"spreadsheet_id": "sheet", "range": "A:C"})
+    status, text = asyncio.run(get_text(service, "/metrics"))
+
+    assert status == 200
+    assert 'service_requests_total{path="/aggregate",status="200"} 1' in text
+    assert 'service_aggregate_cache_total{result="miss"} 1' in text
+
+
+def test_create_app_enables_metrics(make_service, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # make_service only for its teardown, which disables the registry again.
+    service = create_app()
+    try:
+        assert REGISTRY.enabled
+    finally:
+        service.close()
+        service.agent.cache.db.close()
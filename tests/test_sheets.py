@@ -0,0 +1,100 @@
+import datetime
+
+from sheets import CredentialManager, batch_get, group_ranges
+from conftest import FakeSheet
+
+
+class FakeCredentials:
+    """Credentials whose refresh moves the expiry by `lifetime` seconds (0: the expiry never moves)."""
+
+    def __init__(self, seconds_left: float, lifetime: float = 3600.0, refresh_token="refresh"):
+        self.expiry = self.now() + datetime.timedelta(seconds=seconds_left)
+        self.lifetime = lifetime
+        self.refresh_token = refresh_token
+        self.refreshes = 0
+
+    @staticmethod
+    def now():
+        return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+    @property
+    def valid(self):
+        return self.expiry > self.now()
+
+    def refresh(self, request):
+        self.refreshes += 1
+        if self.lifetime:
+            self.expiry = self.now() + datetime.timedelta(seconds=self.lifetime)
+
+    def to_json(self):
+        return "{}"
+
+
+class RecordingEvent:
+    """Stands in for CredentialManager.stopped: records the waits and stops after `limit` of them."""
+
+    def __init__(self, limit: int = 5):
+        self.limit = limit
+        self.waits = []
+
+    def is_set(self):
+        return len(self.waits) >= self.limit
+
+    def set(self):
+        self.limit = 0
+
+    def wait(self, seconds):
+        self.waits.append(seconds)
+        return self.is_set()
+
+
+def manager(tmp_path, creds, limit: int = 5) -> CredentialManager:
+    credentials = CredentialManager(
+        [], token_file=str(tmp_path / "token.json"), creds=creds, request_factory=lambda: None
+    )
+    credentials.stopped = RecordingEvent(limit)
+    return credentials
+
+
+def test_refresh_loop_refreshes_before_expiry(tmp_path):
+    creds = FakeCredentials(seconds_left=100.0)
+    credentials = manager(tmp_path, creds, limit=2)
+    credentials.refresh_loop()
+
+    assert creds.refreshes == 1
+    assert credentials.stopped.waits[0] == 0.0
+    assert 3600.0 - 300.0 - 5 < credentials.stopped.waits[1] <= 3600.0 - 300.0
+
+
+def test_refresh_loop_without_refresh_token_exits(tmp_path):
+    credentials = manager(tmp_path, FakeCredentials(seconds_left=100.0, refresh_token=None))
+    credentials.refresh_loop()
+
+    assert credentials.stopped.waits == []
+
+
+def test_refresh_loop_waits_if_the_expiry_does_not_move(tmp_path):
+    creds = FakeCredentials(seconds_left=100.0, lifetime=0.0)
+    credentials = manager(tmp_path, creds, limit=5)
+    credentials.refresh_loop()
+
+    assert credentials.stopped.waits == [0.0, 60.0, 60.0, 60.0, 60.0]
+    assert creds.refreshes == 4
+
+
+def test_refresh_loop_waits_after_a_failed_refresh(tmp_path):
+    creds = FakeCredentials(seconds_left=100.0)
+    creds.refresh = lambda request: (_ for _ in ()).throw(OSError("offline"))
+    credentials = manager(tmp_path, creds, limit=3)
+    credentials.refresh_loop()
+
+    assert credentials.stopped.waits == [0.0, 60.0, 60.0]
+
+
+def test_batch_get_groups_ranges_per_spreadsheet():
+    sheet = FakeSheet([["h1", "h2"], ["a", "b"], ["c", "d"]])
+    requests = [("one", "S!A1:B1"), ("two", "S!A2:B"), ("one", "S!A1:B1")]
+
+    assert group_ranges(requests) == {"one": ["S!A1:B1"], "two": ["S!A2:B"]}
+    assert batch_get(sheet, requests) == [[["h1", "h2"]], [["a", "b"], ["c", "d"]], [["h1", "h2"]]]
+    assert [call[0] for call in sheet.calls] == ["batchGet", "batchGet"]
@@ -0,0 +1,23 @@
+import pytest
+
+from check_startup import CHECKS, HEAVY_MODULES, check, import_time, measure
+
+
+@pytest.fixture(scope="module")
+def results():
+    return measure(runs=3)
+
+
+@pytest.mark.parametrize("name", sorted(CHECKS))
+def test_commands_load_only_their_heavy_modules(results, name):
+    _, allowed, _ = CHECKS[name]
+    assert [module for module in results[name]["loaded"] if module not in allowed] == []
+
+
+def test_import_times_stay_below_their_share_of_openai(results):
+    assert check(results) == []
+
+
+def test_heavy_modules_are_detected():
+    _, loaded = import_time("import main, numpy")
+    assert "numpy" in loaded and set(loaded) <= set(HEAVY_MODULES)
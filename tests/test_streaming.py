@@ -0,0 +1,127 @@
+import json
+from types import SimpleNamespace
+
+from llm_cache import LLMCache
+from partial_json import PartialJSONParser
+from survey import Survey
+
+MESSAGES = [{"role": "user", "content": "Analyze the results"}]
+USAGE = SimpleNamespace(prompt_tokens=12, completion_tokens=5)
+
+# Strings with the characters the parser must not mistake for structure.
+TRICKY_SURVEY = {
+    "title": "Autos, [Teil 1]",
+    "introduction": 'Sagen Sie uns {ehrlich}, was Sie "wirklich" denken: \\ [ } ,',
+    "questions": [
+        {"question": "Welches Modell, \"M3\" oder [X5]?", "options": [{"option": "M3, klar"}, {"option": "{X5}"}]},
+        {"question": "Wie oft fahren Sie?", "options": [{"option": "\"täglich\""}, {"option": "nie ]"}]}
+    ]
+}
+
+
+def chunks(text: str, size: int) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeCompletions:
+    """chat.completions.create(stream=True): yields one chunk per text part, then a usage-only chunk."""
+
+    def __init__(self, parts: list):
+        self.parts = parts
+        self.calls = 0
+
+    def create(self, stream=False, **kwargs):
+        assert stream
+        self.calls += 1
+        for part in self.parts:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))], usage=None)
+        yield SimpleNamespace(choices=[], usage=USAGE)
+
+
+class FakeStreamManager:
+    """What beta.chat.completions.stream returns: a context manager over content.delta and chunk events."""
+
+    def __init__(self, parts: list):
+        self.parts = parts
+        self.exited = False
+
+    def __enter__(self):
+        for part in self.parts:
+            yield SimpleNamespace(type="chunk", chunk=SimpleNamespace(usage=None))
+            yield SimpleNamespace(type="content.delta", delta=part)
+        yield SimpleNamespace(type="chunk", chunk=SimpleNamespace(usage=USAGE))
+
+    def __exit__(self, *exc_info):
+        self.exited = True
+
+
+class FakeBetaCompletions:
+    def __init__(self, parts: list):
+        self.parts = parts
+        self.managers = []
+
+    def stream(self, response_format=None, **kwargs):
+        assert response_format is Survey
+        self.managers.append(FakeStreamManager(self.parts))
+        return self.managers[-1]
+
+
+def fake_client(parts: list):
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(parts)),
+                           beta=SimpleNamespace(chat=SimpleNamespace(completions=FakeBetaCompletions(parts))))
+
+
+def test_stream_yields_chunks_in_order_and_records_usage(make_agent, registry):
+    agent = make_agent([])
+    agent.openai_client = fake_client(["Die ", "meisten ", "mögen ", "den M3."])
+
+    assert list(agent.stream_completion(MESSAGES)) == ["Die ", "meisten ", "mögen ", "den M3."]
+    metrics = registry.to_prometheus()
+    assert 'llm_tokens_total{kind="prompt",model="gpt-4o-mini"} 12' in metrics
+    assert 'llm_tokens_total{kind="completion",model="gpt-4o-mini"} 5' in metrics
+
+
+def test_streamed_text_is_cached_and_replayed_as_one_chunk(make_agent):
+    agent = make_agent([])
+    agent.openai_client = client = fake_client(["Die ", "meisten ", "mögen ", "den M3."])
+    agent.cache = LLMCache()
+
+    assert list(agent.stream_completion(MESSAGES)) == ["Die ", "meisten ", "mögen ", "den M3."]
+    assert list(agent.stream_completion(MESSAGES)) == ["Die meisten mögen den M3."]
+    assert client.chat.completions.calls == 1
+
+
+def grows(before, after) -> bool:
+    """Checks that a later snapshot only added to an earlier one (members, list elements)."""
+    if isinstance(before, dict):
+        return isinstance(after, dict) and all(key in after and grows(value, after[key])
+                                               for key, value in before.items())
+    if isinstance(before, list):
+        return (isinstance(after, list) and len(before) <= len(after)
+                and all(grows(value, later) for value, later in zip(before, after)))
+    return before == after
+
+
+def test_parser_snapshots_grow_monotonically():
+    text = json.dumps(TRICKY_SURVEY, ensure_ascii=False)
+    for size in (1, 3, 7):
+        parser = PartialJSONParser()
+        snapshots = [snapshot for part in chunks(text, size) if (snapshot := parser.feed(part)) is not None]
+
+        assert len(snapshots) > 5
+        assert all(grows(before, after) for before, after in zip(snapshots, snapshots[1:]))
+        assert snapshots[-1] == TRICKY_SURVEY
+
+
+def test_stream_survey_ends_with_the_validated_survey(make_agent):
+    agent = make_agent([])
+    agent.openai_client = client = fake_client(chunks(json.dumps(TRICKY_SURVEY), 5))
+
+    snapshots = list(agent.stream_survey("BMW"))
+
+    expected = Survey.model_validate(TRICKY_SURVEY).model_dump()
+    assert snapshots[-1] == expected
+    assert snapshots[-2] == expected  # The last partial snapshot is already the whole document.
+    assert all(grows(before, after) for before, after in zip(snapshots, snapshots[1:]))
+    assert client.beta.chat.completions.managers[0].exited
+    assert agent.chat_history[-1] == {"role": "assistant", "content": expected}
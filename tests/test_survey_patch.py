@@ -0,0 +1,119 @@
+import pytest
+
+from survey import Survey, SurveyPatch
+from survey_patch import PatchError, apply_patch, numbered_survey
+
+SURVEY = {
+    "title": "BMW",
+    "introduction": "Fragen zu BMW.",
+    "questions": [
+        {"question": "Modell?", "options": [{"option": "M3"}, {"option": "X5"}]},
+        {"question": "Jahrzehnt?", "options": [{"option": "1980er"}, {"option": "2000er"}, {"option": "2010er"}]}
+    ]
+}
+
+
+def edit(op: str, question: int = None, option: int = None, text: str = None, options: list = None) -> dict:
+    return {"op": op, "question": question, "option": option, "text": text,
+            "options": [{"option": o} for o in options] if options is not None else None}
+
+
+def apply(*edits) -> dict:
+    return apply_patch(Survey.model_validate(SURVEY), SurveyPatch.model_validate({"edits": list(edits)})).model_dump()
+
+
+def questions(survey: dict) -> list:
+    return [(item["question"], [o["option"] for o in item["options"]]) for item in survey["questions"]]
+
+
+def test_set_title_and_introduction():
+    result = apply(edit("set_title", text="Neu"), edit("set_introduction", text="Andere Einleitung."))
+    assert result["title"] == "Neu"
+    assert result["introduction"] == "Andere Einleitung."
+    assert result["questions"] == SURVEY["questions"]
+
+
+def test_add_question_appends_or_inserts():
+    result = apply(edit("add_question", text="Farbe?", options=["Rot", "Blau"]),
+                   edit("add_question", question=0, text="Alter?", options=[]))
+    assert questions(result) == [
+        ("Alter?", []), ("Modell?", ["M3", "X5"]), ("Jahrzehnt?", ["1980er", "2000er", "2010er"]),
+        ("Farbe?", ["Rot", "Blau"])
+    ]
+
+
+def test_add_question_at_the_end_index():
+    assert questions(apply(edit("add_question", question=2, text="Letzte?")))[-1] == ("Letzte?", [])
+
+
+def test_replace_question_text_and_options_independently():
+    result = apply(edit("replace_question", question=0, text="Lieblingsmodell?"),
+                   edit("replace_question", question=1, options=["1990er"]))
+    assert questions(result) == [("Lieblingsmodell?", ["M3", "X5"]), ("Jahrzehnt?", ["1990er"])]
+
+
+def test_remove_question():
+    assert questions(apply(edit("remove_question", question=0))) == [("Jahrzehnt?", ["1980er", "2000er", "2010er"])]
+
+
+def test_option_operations():
+    result = apply(edit("add_option", question=0, text="i4"),
+                   edit("add_option", question=0, option=0, text="Z4"),
+                   edit("replace_option", question=1, option=2, text="2020er"),
+                   edit("remove_option", question=1, option=0))
+    assert questions(result) == [("Modell?", ["Z4", "M3", "X5", "i4"]), ("Jahrzehnt?", ["2000er", "2020er"])]
+
+
+def test_indexes_refer_to_the_survey_after_previous_edits():
+    result = apply(edit("remove_question", question=0), edit("replace_option", question=0, option=0, text="1970er"))
+    assert questions(result) == [("Jahrzehnt?", ["1970er", "2000er", "2010er"])]
+
+
+@pytest.mark.parametrize("bad_edit", [
+    edit("remove_question", question=2),
+    edit("remove_question", question=-1),
+    edit("remove_question"),
+    edit("replace_question", question=5, text="x"),
+    edit("add_question", question=3, text="x"),
+    edit("add_option", question=0, option=3, text="x"),
+    edit("add_option", question=2, text="x"),
+    edit("replace_option", question=0, option=2, text="x"),
+    edit("remove_option", question=1, option=3),
+    edit("remove_option", question=1),
+    edit("set_title"),
+    edit("set_introduction", text=""),
+    edit("add_question"),
+    edit("add_option", question=0),
+    edit("replace_option", question=0, option=0),
+])
+def test_invalid_edits_raise_patch_error(bad_edit):
+    with pytest.raises(PatchError):
+        apply(bad_edit)
+
+
+def test_patch_error_is_a_value_error():
+    assert issubclass(PatchError, ValueError)
+
+
+def test_original_survey_is_unchanged():
+    original = Survey.model_validate(SURVEY)
+    patch = SurveyPatch.model_validate({"edits": [
+        edit("set_title", text="Neu"), edit("remove_question", question=0),
+        edit("add_option", question=0, text="2020er"), edit("replace_question", question=0, options=["x"])
+    ]})
+    apply_patch(original, patch)
+    assert original.model_dump() == SURVEY
+
+
+def test_original_survey_is_unchanged_when_a_later_edit_fails():
+    original = Survey.model_validate(SURVEY)
+    patch = SurveyPatch.model_validate({"edits": [edit("set_title", text="Neu"), edit("remove_question", question=9)]})
+    with pytest.raises(PatchError):
+        apply_patch(original, patch)
+    assert original.model_dump() == SURVEY
+
+
+def test_numbered_survey_lists_indexes():
+    assert numbered_survey(Survey.model_validate(SURVEY)).splitlines()[2:5] == [
+        "question 0: Modell?", "  option 0: M3", "  option 1: X5"
+    ]
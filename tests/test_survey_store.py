@@ -0,0 +1,44 @@
+import json
+
+from conftest import SURVEY
+from survey_store import SurveyStore
+
+
+def titled(title: str) -> dict:
+    return dict(SURVEY, title=title)
+
+
+def test_versions_outside_the_history_are_dropped(tmp_path):
+    store = SurveyStore(str(tmp_path / "survey.json"), history_limit=3)
+    versions = [store.save(titled(f"Version {i}")) for i in range(10)]
+
+    assert store.history == versions[-3:]
+    assert set(store.versions) == set(store.dicts) == set(versions[-3:])
+    assert set(store.raw_versions.values()) <= set(versions[-3:])
+    assert store.undo().title == "Version 8"
+    assert store.undo().title == "Version 7"
+    assert store.undo().title == "Version 7"
+
+
+def test_discarded_redo_branch_is_dropped(tmp_path):
+    store = SurveyStore(str(tmp_path / "survey.json"))
+    first = store.save(titled("A"))
+    second = store.save(titled("B"))
+    store.undo()
+    third = store.save(titled("C"))
+
+    assert store.history == [first, third]
+    assert second not in store.versions and second not in store.dicts
+    assert second not in store.raw_versions.values()
+
+
+def test_external_edits_are_pruned_too(tmp_path):
+    path = tmp_path / "survey.json"
+    store = SurveyStore(str(path), history_limit=2)
+    for i in range(5):
+        path.write_text(json.dumps(titled(f"Extern {i}"), indent=i))
+        assert store.load().title == f"Extern {i}"
+
+    assert len(store.versions) == len(store.dicts) == 2
+    assert len(store.raw_versions) == 2
+    assert store.undo().title == "Extern 3"
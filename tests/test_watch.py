@@ -0,0 +1,119 @@
+import pytest
+
+from conftest import HEADER, SimulatedClock
+from resilience import ServiceError
+from watch import SurveyWatcher, distribution_shift
+
+
+def rows_for(answers: list) -> list:
+    return [[f"t{i}", model, decade] for i, (model, decade) in enumerate(answers)]
+
+
+@pytest.fixture
+def clock():
+    return SimulatedClock()
+
+
+@pytest.fixture
+def make_watcher(make_agent, clock, tmp_path):
+    def make(answers: list, **options):
+        agent = make_agent([HEADER] + rows_for(answers))
+        agent.analyses = []
+        agent.complete = lambda messages, response_format=None: agent.analyses.append(messages) or "analysis"
+        options.setdefault("interval", 30.0)
+        options.setdefault("max_interval", 300.0)
+        options.setdefault("debounce", 120.0)
+        watcher = SurveyWatcher(
+            agent, "sheet-id", "Formularantworten 1!A:C", state_file=str(tmp_path / "watch_state.json"),
+            clock=clock, sleep=clock.sleep, rand=lambda: 0.5, on_analysis=lambda analysis: None, **options
+        )
+        return agent, watcher
+    return make
+
+
+def test_distribution_shift():
+    assert distribution_shift([{"a": 1, "b": 1}], [{"a": 2, "b": 2}]) == 0.0
+    assert distribution_shift([{"a": 1}], [{"b": 1}]) == 1.0
+    assert distribution_shift([{"a": 3, "b": 1}], [{"a": 1, "b": 1}]) == pytest.approx(0.25)
+    assert distribution_shift([{}], [{"a": 1}]) == 1.0
+    assert distribution_shift([{"a": 1}], [{"a": 1}, {}]) == 1.0
+
+
+def test_first_poll_analyzes_and_idle_polls_back_off(make_watcher):
+    agent, watcher = make_watcher([("BMW M3", "1980er"), ("BMW X5", "2000er")])
+
+    assert watcher.poll_once() == 30.0
+    assert watcher.analyses == 1
+    assert [watcher.poll_once() for _ in range(6)] == pytest.approx([45.0, 67.5, 101.25, 151.875, 227.8125, 300.0])
+    assert watcher.analyses == 1
+
+
+def test_small_shift_does_not_reanalyze(make_watcher, clock):
+    answers = [("BMW M3", "1980er"), ("BMW X5", "2000er")] * 50
+    agent, watcher = make_watcher(answers, threshold=0.05)
+    watcher.poll_once()
+    clock.sleep(600)
+
+    agent.pool.rows += rows_for([("BMW M3", "1980er"), ("BMW X5", "2000er")])
+    watcher.poll_once()
+    assert watcher.analyses == 1
+
+
+def test_shift_within_debounce_waits_for_the_window(make_watcher, clock):
+    agent, watcher = make_watcher([("BMW M3", "1980er")] * 10)
+    watcher.poll_once()
+
+    first_analysis = clock()
+    clock.sleep(20)
+    agent.pool.rows += rows_for([("BMW X5", "2000er")] * 10)
+    watcher.interval = watcher.current_interval = 1000.0
+    delay = watcher.poll_once()
+    assert watcher.analyses == 1
+    assert delay == pytest.approx(100.0)  # Wakes up when the debounce window ends, not after the interval.
+
+    clock.sleep(delay)
+    watcher.poll_once()
+    assert watcher.analyses == 2
+    assert clock() - first_analysis == pytest.approx(120.0)
+
+
+def test_fetch_errors_back_off(make_watcher):
+    agent, watcher = make_watcher([("BMW M3", "1980er")])
+
+    def failing_update(*args):
+        raise ServiceError("Google Sheets", "Google Sheets request failed after 5 attempts: 503", status=503)
+
+    agent.update_aggregator = failing_update
+    assert [watcher.poll_once() for _ in range(5)] == [60.0, 120.0, 240.0, 300.0, 300.0]
+
+
+def test_failing_analysis_is_retried_with_backoff(make_watcher, clock):
+    agent, watcher = make_watcher([("BMW M3", "1980er")] * 10)
+    watcher.poll_once()
+    clock.sleep(200)
+
+    attempts = []
+
+    def failing_complete(messages, response_format=None):
+        attempts.append(clock())
+        raise ServiceError("OpenAI", "OpenAI request failed after 5 attempts: 500", status=500)
+
+    agent.complete = failing_complete
+    agent.pool.rows += rows_for([("BMW X5", "2000er")] * 10)
+
+    delays = []
+    for _ in range(50):
+        delay = watcher.poll_once()
+        delays.append(delay)
+        clock.sleep(delay)
+
+    assert min(delays) > 0
+    assert delays[-1] == 300.0
+    assert all(later - earlier >= 120 for earlier, later in zip(attempts, attempts[1:]))
+    assert watcher.analyses == 1
+
+    agent.complete = lambda messages, response_format=None: "analysis"
+    clock.sleep(300)
+    watcher.poll_once()
+    assert watcher.analyses == 2
+    assert not watcher.analysis_failed
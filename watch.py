@@ -0,0 +1,137 @@
+import random
+import time
+
+from agent import SCOPES
+from incremental import IncrementalAggregator
+from resilience import ServiceError
+
+
+def distribution_shift(before: list, after: list) -> float:
+    """
+    Largest total variation distance between the answer distributions of two counter snapshots
+    (one {answer: count} dict per question). 0 means unchanged, 1 means completely different.
+    """
+    shift = 0.0
+    for old, new in zip(before, after):
+        old_total = sum(old.values())
+        new_total = sum(new.values())
+        if not old_total or not new_total:
+            shift = max(shift, 1.0 if old_total != new_total else 0.0)
+            continue
+        distance = 0.5 * sum(
+            abs(old.get(option, 0) / old_total - new.get(option, 0) / new_total)
+            for option in set(old) | set(new)
+        )
+        shift = max(shift, distance)
+    if len(before) != len(after):
+        shift = 1.0
+    return shift
+
+
+class SurveyWatcher:
+    """
+    Polls a response sheet, folds new rows into running counters and re-runs the LLM analysis
+    only when the answer distributions moved by at least `threshold` since the last analysis,
+    and at most once per `debounce` seconds.
+
+    Polling starts every `interval` seconds and backs off (up to `max_interval`) while nothing changes
+    or requests fail; every delay is jittered by +-`jitter` so many watchers do not poll in lockstep.
+    Clock, sleep and randomness are injectable, so the loop can run against a simulated clock.
+    """
+
+    def __init__(self, agent, spreadsheet_id: str, range_def: str, scopes=SCOPES,
+                 interval: float = 30.0, max_interval: float = 300.0, backoff: float = 1.5, jitter: float = 0.1,
+                 threshold: float = 0.05, debounce: float = 120.0, on_analysis=None,
+                 state_file: str = "watch_state.json", clock=time.monotonic, sleep=time.sleep, rand=random.random):
+        self.agent = agent
+        self.spreadsheet_id = spreadsheet_id
+        self.range_def = range_def
+        self.scopes = scopes
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.threshold = threshold
+        self.debounce = debounce
+        self.on_analysis = on_analysis or print
+        self.clock = clock
+        self.sleep = sleep
+        self.rand = rand
+
+        self.aggregator = IncrementalAggregator(state_file)
+        self.current_interval = interval
+        self.analyzed_counters = None
+        self.last_analysis_at = None
+        self.analysis_failed = False
+        self.analyses = 0
+
+    def snapshot(self) -> list:
+        return [dict(counter) for counter in self.aggregator.counters]
+
+    def due(self) -> bool:
+        """Checks whether the distributions shifted enough, and the debounce window is over."""
+        if self.analyzed_counters is not None:
+            if distribution_shift(self.analyzed_counters, self.aggregator.counters) < self.threshold:
+                return False
+        if self.last_analysis_at is not None and self.clock() - self.last_analysis_at < self.debounce:
+            return False
+        return True
+
+    def analyze(self):
+        """Runs the LLM analysis on the current counters and hands it to on_analysis."""
+        survey = self.agent.load_survey()
+        results = self.agent.normalize_results(
+            self.aggregator.result(survey.get("title", ""), survey.get("introduction", ""))
+        )
+        analysis = self.agent.complete(self.agent.build_analysis_messages(survey, results))
+        self.analyzed_counters = self.snapshot()
+        self.last_analysis_at = self.clock()
+        self.analyses += 1
+        self.on_analysis(analysis)
+
+    def poll_once(self) -> float:
+        """Polls the sheet once, re-analyzes if due, and returns the delay until the next poll."""
+        try:
+            new_rows = self.agent.update_aggregator(self.aggregator, self.scopes, self.spreadsheet_id, self.range_def)
+        except ServiceError as err:
+            print(err)
+            self.current_interval = min(self.current_interval * 2, self.max_interval)
+            return self.jittered(self.current_interval)
+
+        if new_rows:
+            self.aggregator.save()
+            self.current_interval = self.interval
+        else:
+            self.current_interval = min(self.current_interval * self.backoff, self.max_interval)
+
+        if new_rows is not None and self.aggregator.last_row > 1 and self.due():
+            try:
+                self.analyze()
+                self.analysis_failed = False
+            except Exception as e:
+                print(f"An error occurred during survey analysis generation: {e}")
+                # The failed attempt counts against the debounce window, and polling backs off
+                # like after a failed fetch, so a failing LLM call is not retried on every poll.
+                self.last_analysis_at = self.clock()
+                self.analysis_failed = True
+                self.current_interval = min(self.current_interval * 2, self.max_interval)
+
+        delay = self.current_interval
+        if not self.analysis_failed and self.analyzed_counters is not None and self.last_analysis_at is not None:
+            # Wake up when the debounce window ends if an analysis is pending.
+            pending = distribution_shift(self.analyzed_counters, self.aggregator.counters) >= self.threshold
+            if pending:
+                delay = min(delay, max(self.debounce - (self.clock() - self.last_analysis_at), 0.0))
+        return self.jittered(delay)
+
+    def jittered(self, delay: float) -> float:
+        return max(delay * (1 + self.jitter * (2 * self.rand() - 1)), 0.0)
+
+    def run(self, max_polls: int = None):
+        """Polls until interrupted (or max_polls polls have been made)."""
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            delay = self.poll_once()
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                self.sleep(delay)